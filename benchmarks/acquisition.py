@@ -0,0 +1,266 @@
+"""Acquisition throughput benchmark against simulated instruments.
+
+Drives one `Controller` per rig with 1–128 active jigs against the local stand-ins in
+`benchmarks.simulators` and reports throughput, per-pulse latency and bytes
+written, flagging regressions against a stored baseline.
+
+Usage:
+    python -m benchmarks.acquisition --jigs 1 8 128 --duration 10
+    python -m benchmarks.acquisition --jigs 8 --rigs 4  # Parallel instrument chains
+    python -m benchmarks.acquisition --save  # Update the baseline
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from dataclasses import asdict, dataclass
+import json
+import os
+import sys
+import tempfile
+import threading
+from time import perf_counter, sleep
+from typing import Dict, List
+
+import numpy as np
+
+from benchmarks.simulators import Behaviour, NodeForwarderHandler, PicoscopeHandler, Simulator
+from remotecontrol import catalog, controller, jigs, logger, mux, rig
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+TOLERANCE = 0.2  # Relative slack before a change counts as a regression
+SWITCHES_PER_MODULE = 16
+
+
+@dataclass
+class Result:
+    n_jigs: int
+    n_rigs: int
+    pulses: int
+    pulses_per_s: float
+    p50_ms: float
+    p99_ms: float
+    bytes_written: int
+    burst: int = 1
+
+    @property
+    def key(self) -> str:
+        """Baseline key, e.g. "8 jigs" or "8 jigs, 2 rigs, burst 4"."""
+
+        key = f'{self.n_jigs} jigs'
+
+        if self.n_rigs > 1:
+            key += f', {self.n_rigs} rigs'
+
+        if self.burst > 1:
+            key += f', burst {self.burst}'
+
+        return key
+
+
+def _payload(exp_id: str, interval: float, codec: Dict, burst: int, burst_mode: str) -> dict:
+    return {
+        'exp_id': exp_id,
+        'exp_duration_h': 1,
+        'interval': interval,
+        'burst': burst,
+        'burst_mode': burst_mode,
+        'pulser': {'gain_dB': 30},
+        'picoscope': {'delay': 10, 'duration': 10, 'voltage_range': 1, 'avg_num': 8},
+        'codec': codec,
+    }
+
+
+def run(
+    n_jigs: int,
+    duration_s: float,
+    interval: float,
+    codec: Dict,
+    burst: int = 1,
+    burst_mode: str = 'rows'
+) -> Result:
+    """One benchmark round, jigs spread round-robin over every rig in
+    docker.json. Latencies are per acquisition, i.e. per burst."""
+
+    rigs = list(rig.rigs().values())
+    catalog_ = catalog.Catalog(path=f'catalog_{n_jigs}.json')
+    jig_table: Dict[str, jigs.Jig] = dict()
+    controllers = [
+        controller.Controller(rig=rig_, registry=jigs.Registry(), jig_table=jig_table)
+        for rig_ in rigs
+    ]
+    jig_table.update({
+        f'jig{i}': jigs.Jig(
+            name=f'jig{i}',
+            mux=mux.Channel(switch=i % SWITCHES_PER_MODULE, module=i // SWITCHES_PER_MODULE),
+            rig=rigs[i % len(rigs)],
+            registry=controllers[i % len(rigs)].registry,
+            catalog=catalog_
+        )
+        for i in range(n_jigs)
+    })
+    latencies: List[float] = list()
+
+    def timed(acquire):
+        def wrapper(*args):
+            start = perf_counter()
+            capture = acquire(*args)
+            latencies.append(perf_counter() - start)
+
+            return capture
+
+        return wrapper
+
+    for jig in jig_table.values():
+        jig.acquire = timed(jig.acquire)
+
+    with ThreadPoolExecutor(max_workers=n_jigs) as executor:
+        list(executor.map(
+            lambda jig: jig.start(_payload(f'bench_{n_jigs}_{jig.name}', interval, codec, burst, burst_mode)),
+            jig_table.values()
+        ))
+
+    done = threading.Event()
+
+    def loop(controller_):
+        while not done.is_set():
+            controller_.step()
+
+    threads = [threading.Thread(target=loop, args=(controller_,), daemon=True) for controller_ in controllers]
+    started = perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    sleep(duration_s)
+    elapsed = perf_counter() - started
+    pulses = len(latencies)
+
+    for jig in jig_table.values():
+        jig.stop()
+
+    done.set()
+
+    for controller_, thread in zip(controllers, threads):
+        with controller_.registry.condition:
+            controller_.registry.condition.notify_all()
+
+        thread.join(timeout=1)
+        controller_.pipeline.join()
+        controller_.pipeline.stop()
+
+    for jig in jig_table.values():
+        jig.database.close()
+
+    latencies_ms = np.array(latencies[:pulses]) * 1e3
+
+    return Result(
+        n_jigs=n_jigs,
+        n_rigs=len(rigs),
+        pulses=pulses * burst,
+        pulses_per_s=pulses * burst / elapsed,
+        p50_ms=float(np.percentile(latencies_ms, 50)) if pulses > 0 else float('nan'),
+        p99_ms=float(np.percentile(latencies_ms, 99)) if pulses > 0 else float('nan'),
+        bytes_written=sum(record.bytes_written for record in catalog_.records.values()),
+        burst=burst
+    )
+
+
+def regressions(results: List[Result], baseline: Dict[str, dict], tolerance: float = TOLERANCE) -> List[str]:
+    """
+    Returns:
+        list[str]: Human-readable description of every regression.
+    """
+
+    found = list()
+
+    for result in results:
+        reference = baseline.get(result.key)
+
+        if reference is None:
+            continue
+
+        if result.pulses_per_s < reference['pulses_per_s'] * (1 - tolerance):
+            found.append(
+                f"{result.key}: {result.pulses_per_s:.1f} pulses/s, "
+                f"baseline {reference['pulses_per_s']:.1f}"
+            )
+
+        if result.p99_ms > reference['p99_ms'] * (1 + tolerance):
+            found.append(
+                f"{result.key}: p99 {result.p99_ms:.1f} ms, baseline {reference['p99_ms']:.1f}"
+            )
+
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--jigs', type=int, nargs='+', default=[1, 8, 128])
+    parser.add_argument('--rigs', type=int, default=1, help='Simulated instrument chains.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per round.')
+    parser.add_argument('--interval', type=float, default=1e-3, help='Pulse interval per jig [s].')
+    parser.add_argument('--latency', type=float, default=Behaviour.latency_s, help='Instrument latency [s].')
+    parser.add_argument('--jitter', type=float, default=Behaviour.jitter_s, help='Instrument jitter [s].')
+    parser.add_argument('--samples', type=int, default=Behaviour.n_samples, help='Samples per waveform.')
+    parser.add_argument('--burst', type=int, default=1, help='Captures per mux/pulser configuration.')
+    parser.add_argument('--burst-mode', default='rows', help='rows or mean.')
+    parser.add_argument('--codec', type=json.loads, default=dict(), help='Codec spec as json.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument('--save', action='store_true', help='Store results as the new baseline.')
+    args = parser.parse_args()
+
+    behaviour = Behaviour(latency_s=args.latency, jitter_s=args.jitter, n_samples=args.samples)
+
+    with ExitStack() as stack:
+        chains = [
+            {
+                'mux': stack.enter_context(Simulator(NodeForwarderHandler, behaviour)).container,
+                'pulser': stack.enter_context(Simulator(NodeForwarderHandler, behaviour)).container,
+                'picoscope': stack.enter_context(Simulator(PicoscopeHandler, behaviour)).container,
+            }
+            for _ in range(args.rigs)
+        ]
+        workdir = stack.enter_context(tempfile.TemporaryDirectory())
+        os.chdir(workdir)
+        logger.configure()
+
+        with open('docker.json', 'w') as json_file:
+            json.dump({
+                **chains[0],
+                'remotecontrol': {'host': '127.0.0.1', 'port': 0},
+                'rigs': {f'rig{i}': chain for i, chain in enumerate(chains[1:], start=1)},
+            }, json_file)
+
+        results = [
+            run(n, args.duration, args.interval, args.codec, args.burst, args.burst_mode)
+            for n in args.jigs
+        ]
+
+    for result in results:
+        print(
+            f'{result.key:>16}: {result.pulses_per_s:8.1f} pulses/s, '
+            f'p50 {result.p50_ms:6.1f} ms, p99 {result.p99_ms:6.1f} ms, '
+            f'{result.bytes_written / 1e6:8.1f} MB written'
+        )
+
+    if args.save:
+        with open(BASELINE, 'w') as json_file:
+            json.dump({result.key: asdict(result) for result in results}, json_file, indent=4)
+
+        return 0
+
+    if not os.path.isfile(BASELINE):
+        return 0
+
+    with open(BASELINE, 'r') as json_file:
+        found = regressions(results, json.load(json_file), args.tolerance)
+
+    for regression in found:
+        print(f'REGRESSION {regression}', file=sys.stderr)
+
+    return 1 if len(found) > 0 else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,118 @@
+"""Local stand-ins for the lab instruments.
+
+Mimic just enough of nodeforwarder (/writecf, /read, /lastread, /flushbuffer)
+and the picoscope container (/get_wave) to drive the controller without the
+Cytec mux, Ultratek pulser or PicoScope, with configurable latency, jitter
+and waveform size.
+"""
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import random
+import threading
+from time import sleep
+from typing import Type
+from urllib.parse import unquote
+
+import numpy as np
+
+NPY_MIME = 'application/x-npy'
+
+
+@dataclass
+class Behaviour:
+    """
+    Attributes:
+        latency_s (float): Mean response time [s].
+        jitter_s (float): Uniform +/- spread around the mean [s].
+        n_samples (int): Waveform length (picoscope only).
+    """
+
+    latency_s: float = 0.005
+    jitter_s: float = 0.001
+    n_samples: int = 10_000
+
+    def wait(self) -> None:
+        sleep(max(self.latency_s + random.uniform(-self.jitter_s, self.jitter_s), 0))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    behaviour: Behaviour = Behaviour()
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real services
+    disable_nagle_algorithm = True  # Otherwise delayed ACKs add ~40 ms per request
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, body: bytes, content_type: str = 'text/html') -> None:
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class NodeForwarderHandler(_Handler):
+    last: bytes = b''
+
+    def do_GET(self):
+        self.behaviour.wait()
+        command, _, payload = self.path.lstrip('/').partition('/')
+
+        if command == 'writecf':  # Batched commands arrive joined by CRLF, the instrument echoes the last
+            type(self).last = unquote(payload).split('\r\n')[-1].encode()
+
+        self._respond(self.last if command in ('read', 'lastread') else b'OK')
+
+
+class PicoscopeHandler(_Handler):
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.behaviour.wait()
+        waveform = np.random.default_rng().normal(size=self.behaviour.n_samples).astype(np.float32)
+
+        if NPY_MIME in self.headers.get('Accept', ''):
+            buffer = io.BytesIO()
+            np.save(buffer, waveform)
+            self._respond(buffer.getvalue(), NPY_MIME)
+            return
+
+        self._respond(json.dumps({'amps': waveform.tolist()}).encode(), 'application/json')
+
+
+class Simulator:
+    """An instrument stand-in served from a background thread.
+
+    Example:
+        with Simulator(PicoscopeHandler, Behaviour(n_samples=2000)) as scope:
+            scope.container  # {'host': '127.0.0.1', 'port': ...}
+    """
+
+    def __init__(self, handler: Type[_Handler], behaviour: Behaviour = Behaviour()):
+        handler = type(handler.__name__, (handler,), {'behaviour': behaviour})
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def container(self) -> dict:
+        """docker.json entry pointing at this simulator."""
+
+        return {'host': '127.0.0.1', 'ip': None, 'port': self.server.server_address[1]}
+
+    def __enter__(self) -> 'Simulator':
+        self.thread.start()
+
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,264 @@
+"""Catalog of experiments, kept up to date as data is written.
+
+Replaces scanning the acoustics folder (`utils.last_folder_update`) for
+oversight: the controller reports starts, stops and commits, and experiments
+run outside the controller can be picked up through inotify.
+"""
+
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+import json
+import logging
+import os
+import threading
+from time import time
+from typing import Dict, List, Optional
+
+from remotecontrol import config, utils
+
+FILENAME = 'catalog.json'  # In the state directory, see `config.state_path`
+LEGACY_PATH = 'acoustics/catalog.json'  # Before it moved out of the synced folder
+SAVE_INTERVAL_S = 10  # Max time a write goes unpersisted
+STALE_AFTER_S = 600  # Experiments run outside the controller count as live until quiet this long
+SUFFIX = '.sqlite3'
+
+
+@dataclass
+class Record:
+    """One experiment.
+
+    Attributes:
+        exp_id (str): Experiment ID, also the database filename.
+        jig (str | None): Jig name, None if run outside the controller.
+        started (float): Unix timestamp.
+        ended (float | None): Unix timestamp, None while running.
+        rows (int): Waveforms committed.
+        bytes_written (int): Size of committed waveforms, or of the database
+            file for experiments run outside the controller.
+        last_write (float): Unix timestamp of the last commit, -1.0 if none.
+        rows_dropped (int): Waveforms that failed to commit.
+    """
+
+    exp_id: str
+    jig: Optional[str]
+    started: float
+    ended: Optional[float] = None
+    rows: int = 0
+    bytes_written: int = 0
+    last_write: float = -1.0
+    rows_dropped: int = 0
+
+    @property
+    def live(self) -> bool:
+        if self.ended is not None:
+            return False
+
+        if self.jig is not None:
+            return True
+
+        return time() - self.last_write < STALE_AFTER_S
+
+
+class Catalog:
+    """All experiments by ID, with the live ones indexed separately.
+
+    Every update is O(1). The catalog is persisted as json on start/stop and
+    at most every `SAVE_INTERVAL_S` otherwise.
+
+    Example:
+        catalog.start(exp_id='INL_GT_DE_2022_08_01_1', jig='pikachu')
+        catalog.record_write(exp_id='INL_GT_DE_2022_08_01_1', rows=64, n_bytes=2**20)
+        catalog.is_live('INL_GT_DE_2022_08_01_1')
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (str, optional): Defaults to catalog.json in the state
+                directory.
+        """
+
+        self.path = config.state_path(FILENAME) if path is None else path
+        self.records: Dict[str, Record] = dict()
+        self.last_update: float = -1.0
+        self._live: Dict[str, Record] = dict()
+        self._last_save: float = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        if not os.path.isfile(self.path):
+            return
+
+        with open(self.path, 'r') as json_file:
+            records = json.load(json_file)
+
+        for record in records:
+            self._add(utils.dataclass_from_dict(Record, record))
+
+    def _add(self, record: Record) -> None:
+        self.records[record.exp_id] = record
+        self.last_update = max(self.last_update, record.last_write)
+
+        if record.ended is None:
+            self._live[record.exp_id] = record
+
+    def _save(self) -> None:
+        """Atomic, so readers never see a half-written file. Call with the
+        lock held."""
+
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temporary = f'{self.path}.tmp'
+
+        with open(temporary, 'w') as json_file:
+            json.dump([asdict(record) for record in self.records.values()], json_file)
+
+        os.replace(temporary, self.path)
+        self._last_save = time()
+
+    @property
+    def live(self) -> List[Record]:
+        with self._lock:
+            return [record for record in self._live.values() if record.live]
+
+    def is_live(self, exp_id: str) -> bool:
+        record = self._live.get(exp_id)
+
+        return record is not None and record.live
+
+    def start(self, exp_id: str, jig: Optional[str] = None) -> None:
+        """New record, unless there is one already, e.g. resumed after a
+        restart or started again with the same exp_id. Both append to the same
+        database, so that record is continued."""
+
+        with self._lock:
+            record = self.records.get(exp_id)
+
+            if record is None:
+                self._add(Record(exp_id=exp_id, jig=jig, started=time()))
+            else:
+                record.jig, record.ended = jig, None
+                self._live[exp_id] = record
+
+            self._save()
+
+    def stop(self, exp_id: str) -> None:
+        with self._lock:
+            record = self._live.pop(exp_id, None)
+
+            if record is None:
+                return
+
+            record.ended = time()
+            self._save()
+
+    def record_write(self, exp_id: str, rows: int, n_bytes: int, timestamp: Optional[float] = None) -> None:
+        """Called after each commit.
+
+        Args:
+            exp_id (str): Experiment ID.
+            rows (int): Rows in the commit.
+            n_bytes (int): Waveform bytes in the commit.
+            timestamp (float, optional): Defaults to now.
+        """
+
+        timestamp = time() if timestamp is None else timestamp
+
+        with self._lock:
+            record = self.records.get(exp_id)
+
+            if record is None:
+                record = Record(exp_id=exp_id, jig=None, started=timestamp)
+                self._add(record)
+
+            record.rows += rows
+            record.bytes_written += n_bytes
+            record.last_write = timestamp
+            self.last_update = max(self.last_update, timestamp)
+
+            if timestamp - self._last_save > SAVE_INTERVAL_S:
+                self._save()
+
+    def record_drop(self, exp_id: str, rows: int) -> None:
+        """Called when rows fail to commit."""
+
+        with self._lock:
+            record = self.records.get(exp_id)
+
+            if record is None:
+                record = Record(exp_id=exp_id, jig=None, started=time())
+                self._add(record)
+
+            record.rows_dropped += rows
+            self._save()  # Rare, and worth knowing about right away
+
+    def _touch(self, file_path: str) -> None:
+        """Update an experiment written to outside the controller.
+
+        Args:
+            file_path (str): Database file or its -wal file.
+        """
+
+        exp_id = os.path.basename(file_path).removesuffix('-wal').removesuffix(SUFFIX)
+
+        try:
+            stat = os.stat(file_path)
+        except FileNotFoundError:
+            return
+
+        with self._lock:
+            record = self.records.get(exp_id)
+
+            if record is not None and record.jig is not None:
+                return  # Controller reports these itself
+
+            if record is None:
+                record = Record(exp_id=exp_id, jig=None, started=stat.st_mtime)
+                self._add(record)
+
+            record.bytes_written = stat.st_size
+            record.last_write = stat.st_mtime
+            self.last_update = max(self.last_update, stat.st_mtime)
+
+            if time() - self._last_save > SAVE_INTERVAL_S:
+                self._save()
+
+    def watch(self, folder: str = 'acoustics') -> Optional[threading.Thread]:
+        """Follow databases written outside the controller via inotify.
+
+        Needs the optional inotify_simple package (Linux only).
+
+        Returns:
+            threading.Thread | None: Watcher thread, None if inotify is
+                unavailable.
+        """
+
+        try:
+            from inotify_simple import INotify, flags
+        except ImportError:
+            logging.info('inotify_simple not installed, not watching for external experiments.')
+            return None
+
+        os.makedirs(folder, exist_ok=True)
+        inotify = INotify()
+        inotify.add_watch(folder, flags.CLOSE_WRITE | flags.MODIFY | flags.CREATE)
+
+        def follow():
+            while True:
+                for event in inotify.read():
+                    if event.name.removesuffix('-wal').endswith(SUFFIX):
+                        self._touch(os.path.join(folder, event.name))
+
+        thread = threading.Thread(target=follow, name='catalog-watch', daemon=True)
+        thread.start()
+
+        return thread
+
+
+@lru_cache(maxsize=None)
+def default() -> Catalog:
+    """The shared catalog, loaded on first use."""
+
+    config.adopt(LEGACY_PATH, config.state_path(FILENAME))
+
+    return Catalog()
@@ -0,0 +1,309 @@
+"""Waveform codecs for the amps BLOB.
+
+Every row stores a small json header next to its BLOB (dtype, shape, scale,
+offset, delta, compression), so readers never have to guess how to decode it.
+Rows without a header predate this and are raw float16.
+
+Acoustic waveforms from one jig change slowly, so the cheap wins are:
+    - int16: quantize with a stored scale/offset (~half the size of float32).
+    - delta: store the difference to the previous waveform—integer subtraction
+        for int16, XOR of the bit patterns for floats (lossless either way).
+        Mostly zeros, which is what zlib/lzma are good at.
+    - compression: stdlib zlib or lzma on top.
+
+Delta rows form chains starting at a keyframe. Each header records its
+position in the chain (`n`, 0 for keyframes) so a reader can back up to the
+keyframe before decoding a range, and the encoder's row count (`seq`) so a
+reader notices when a row of the chain never got stored.
+"""
+
+from dataclasses import dataclass
+import json
+import lzma
+from typing import Dict, List, Optional, Sequence, Tuple
+import zlib
+
+import numpy as np
+
+DTYPES = ('float16', 'float32', 'int16')
+COMPRESSIONS = (None, 'zlib', 'lzma')
+KEYFRAME_INTERVAL = 100  # Delta rows after each keyframe
+HEADROOM = 1.25  # int16 range at a keyframe relative to the waveform's, so drift doesn't force new keyframes
+INT16_MAX = np.iinfo(np.int16).max
+
+# The unsigned integer type with the same width, used for delta arithmetic
+_BITS: Dict[str, np.dtype] = {
+    'float16': np.dtype(np.uint16),
+    'float32': np.dtype(np.uint32),
+    'int16': np.dtype(np.uint16),
+}
+LEGACY_HEADER: Dict = {
+    'dtype': 'float16',
+    'shape': [-1],
+    'scale': 1.0,
+    'offset': 0.0,
+    'delta': False,
+    'n': 0,
+    'compression': None,
+}
+
+
+@dataclass(frozen=True)
+class Spec:
+    """How an experiment's waveforms are encoded. Passed as "codec" in /start.
+
+    Attributes:
+        dtype (str): Storage type, one of float16, float32 or int16.
+        delta (bool): Store differences to the previous waveform.
+        compression (str | None): zlib, lzma or None.
+        keyframe_interval (int): Max delta rows after each keyframe.
+    """
+
+    dtype: str = 'float16'
+    delta: bool = False
+    compression: Optional[str] = None
+    keyframe_interval: int = KEYFRAME_INTERVAL
+
+    def __post_init__(self):
+        if self.dtype not in DTYPES:
+            raise ValueError(f'Unknown dtype {self.dtype}, use one of {DTYPES}.')
+
+        if self.compression not in COMPRESSIONS:
+            raise ValueError(f'Unknown compression {self.compression}, use one of {COMPRESSIONS}.')
+
+        object.__setattr__(self, 'delta', bool(self.delta))
+        object.__setattr__(self, 'keyframe_interval', int(self.keyframe_interval))
+
+        if self.keyframe_interval < 1:
+            raise ValueError(f'Keyframe interval must be at least 1, got {self.keyframe_interval}.')
+
+
+def _compress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == 'zlib':
+        return zlib.compress(data)
+
+    if compression == 'lzma':
+        return lzma.compress(data)
+
+    return data
+
+
+def _decompress(data: bytes, compression: Optional[str]) -> bytes:
+    if compression == 'zlib':
+        return zlib.decompress(data)
+
+    if compression == 'lzma':
+        return lzma.decompress(data)
+
+    return data
+
+
+class Encoder:
+    """Stateful encoder, one per experiment since deltas depend on the
+    previous waveform. Not thread safe.
+
+    Example:
+        encoder = Encoder(Spec(dtype='int16', delta=True, compression='zlib'))
+        blob, header = encoder.encode(waveform)
+    """
+
+    def __init__(self, spec: Spec = Spec()):
+        self.spec = spec
+        self._previous: Optional[np.ndarray] = None
+        self._n: int = 0
+        self._seq: int = -1
+        self._scale: float = 1.0
+        self._offset: float = 0.0
+
+    def _quantize(self, waveform: np.ndarray, keyframe: bool) -> Tuple[np.ndarray, bool]:
+        """
+        Returns:
+            tuple[np.ndarray, bool]: Quantized waveform and whether it had to
+                become a keyframe because it left the current int16 range.
+        """
+
+        if keyframe or self._out_of_range(waveform):
+            low, high = float(waveform.min()), float(waveform.max())
+            self._offset = (high + low) / 2
+            self._scale = (high - low) * HEADROOM / (2 * INT16_MAX) or 1.0
+            keyframe = True
+
+        quantized = np.rint((waveform - self._offset) / self._scale).astype(np.int16)
+
+        return quantized, keyframe
+
+    def _out_of_range(self, waveform: np.ndarray) -> bool:
+        limit = INT16_MAX * self._scale
+
+        return bool(
+            waveform.max() > self._offset + limit
+            or waveform.min() < self._offset - limit
+        )
+
+    def restart(self) -> None:
+        """Make the next row a keyframe, e.g. after rows failed to store."""
+
+        self._previous = None
+
+    def encode(self, waveform: np.ndarray) -> Tuple[bytes, str]:
+        """
+        Args:
+            waveform (np.ndarray): Any shape.
+
+        Returns:
+            tuple[bytes, str]: BLOB and its json header.
+        """
+
+        waveform = np.asarray(waveform)
+        keyframe = (
+            not self.spec.delta
+            or self._previous is None
+            or self._previous.shape != waveform.shape
+            or self._n >= self.spec.keyframe_interval
+        )
+
+        if self.spec.dtype == 'int16':
+            samples, keyframe = self._quantize(waveform.astype(np.float64), keyframe)
+        else:
+            samples = waveform.astype(self.spec.dtype)
+
+        self._n = 0 if keyframe else self._n + 1
+        self._seq += 1
+        bits = samples.view(_BITS[self.spec.dtype])
+        stored = bits
+
+        if not keyframe:
+            stored = bits - self._previous if self.spec.dtype == 'int16' else bits ^ self._previous
+
+        self._previous = bits
+        header = {
+            'dtype': self.spec.dtype,
+            'shape': list(waveform.shape),
+            'scale': self._scale if self.spec.dtype == 'int16' else 1.0,
+            'offset': self._offset if self.spec.dtype == 'int16' else 0.0,
+            'delta': not keyframe,
+            'n': self._n,
+            'seq': self._seq,
+            'compression': self.spec.compression,
+        }
+        blob = _compress(np.ascontiguousarray(stored).tobytes(), self.spec.compression)
+
+        return blob, json.dumps(header)
+
+
+def parse_header(header: Optional[str]) -> Dict:
+    return LEGACY_HEADER if header is None else json.loads(header)
+
+
+class Decoder:
+    """Stateful decoder that carries delta chains across calls, so a long
+    range can be decoded chunk by chunk.
+
+    Example:
+        decoder = Decoder()
+        for blobs, headers in chunks:
+            waveforms = decoder.decode(blobs, headers)
+    """
+
+    def __init__(self):
+        self._previous: Optional[np.ndarray] = None  # Bits of the last decoded row
+        self._dtype: Optional[str] = None
+        self._seq: Optional[int] = None  # Of the last decoded row
+        self._broken: bool = False  # Last decoded row followed a gap
+        self.broken: np.ndarray = np.zeros(0, dtype=bool)  # Rows of the last decode that followed a gap
+
+    def decode(self, blobs: Sequence[bytes], headers: Sequence[Optional[str]]) -> np.ndarray:
+        """Decode consecutive rows of one experiment into a single array.
+
+        Delta chains are undone with one vectorized accumulate per chain, and
+        scale/offset are applied to all rows at once. A delta row whose
+        predecessor is missing (its `seq` doesn't follow) can't be recovered,
+        so it and the rest of its chain are NaN and flagged in `broken`.
+
+        Args:
+            blobs (Sequence[bytes]): amps column, in time order.
+            headers (Sequence[str | None]): codec column, same order.
+
+        Raises:
+            ValueError: Rows disagree on dtype/shape, or the first row is in
+                the middle of a delta chain this decoder hasn't seen the start
+                of (back up `n` rows first).
+
+        Returns:
+            np.ndarray: float32, shape (rows, *waveform shape).
+        """
+
+        parsed: List[Dict] = [parse_header(header) for header in headers]
+
+        if len(parsed) == 0:
+            self.broken = np.zeros(0, dtype=bool)
+            return np.empty((0,), dtype=np.float32)
+
+        dtype, shape = parsed[0]['dtype'], parsed[0]['shape']
+
+        if any(header['dtype'] != dtype or header['shape'] != shape for header in parsed):
+            raise ValueError('All rows must share dtype and shape to be decoded together.')
+
+        raw = b''.join(
+            _decompress(blob, header['compression']) for blob, header in zip(blobs, parsed)
+        )
+        bits = np.frombuffer(raw, dtype=_BITS[dtype]).reshape(len(parsed), -1).copy()
+        deltas = [header['delta'] for header in parsed]
+        continues = deltas[0]
+
+        if continues:
+            if self._previous is None or self._dtype != dtype or self._previous.shape[0] != bits.shape[1]:
+                raise ValueError(f"First row is {parsed[0]['n']} rows into a delta chain.")
+
+            bits = np.vstack([self._previous, bits])
+            deltas = [False] + deltas
+
+        keyframes = [i for i, delta in enumerate(deltas) if not delta]
+
+        for start, end in zip(keyframes, keyframes[1:] + [len(deltas)]):
+            if end - start == 1:
+                continue
+
+            if dtype == 'int16':
+                np.cumsum(bits[start:end], axis=0, dtype=bits.dtype, out=bits[start:end])
+            else:
+                np.bitwise_xor.accumulate(bits[start:end], axis=0, out=bits[start:end])
+
+        if continues:
+            bits = bits[1:]
+
+        self._previous, self._dtype = bits[-1].copy(), dtype
+        self.broken = self._find_broken(parsed)
+        values = bits.view(dtype).astype(np.float32)
+
+        if dtype == 'int16':
+            scale = np.array([header['scale'] for header in parsed], dtype=np.float32)
+            offset = np.array([header['offset'] for header in parsed], dtype=np.float32)
+            values = values * scale[:, None] + offset[:, None]
+
+        values[self.broken] = np.nan
+
+        return values.reshape(len(parsed), *shape)
+
+    def _find_broken(self, parsed: List[Dict]) -> np.ndarray:
+        """Delta rows after a gap in `seq`, up to the next keyframe. Rows
+        without `seq` predate it and are taken to be complete."""
+
+        broken = np.zeros(len(parsed), dtype=bool)
+
+        for i, header in enumerate(parsed):
+            seq = header.get('seq')
+
+            if header['delta']:
+                gap = seq is not None and self._seq is not None and seq != self._seq + 1
+                broken[i] = self._broken or gap
+
+            self._seq, self._broken = seq, bool(broken[i])
+
+        return broken
+
+
+def decode(blobs: Sequence[bytes], headers: Sequence[Optional[str]]) -> np.ndarray:
+    """One-off `Decoder.decode`; the first row must be a keyframe."""
+
+    return Decoder().decode(blobs, headers)
@@ -0,0 +1,51 @@
+"""Instrument and server config from docker.json.
+
+Read once, on first use rather than at import, so the package can be
+imported (by tests, tooling, the benchmark) without any hardware config.
+"""
+
+from functools import lru_cache
+import json
+import os
+from typing import Dict
+
+PATH = 'docker.json'
+STATE_DIR = 'state'  # Controller-local files, unlike acoustics/ never synced to drops
+
+
+@lru_cache(maxsize=None)
+def containers(path: str = PATH) -> Dict[str, dict]:
+    """
+    Args:
+        path (str, optional): Defaults to 'docker.json'.
+
+    Returns:
+        dict[str, dict]: docker.json entries by container name.
+    """
+
+    with open(path, 'r') as json_file:
+        return json.load(json_file)
+
+
+def state_path(filename: str) -> str:
+    """Location of a controller-local file, e.g. the journal.
+
+    Kept out of acoustics/, which syncthing publishes and other boxes may
+    share. The directory is "state_dir" of the remotecontrol entry in
+    docker.json if set, else `STATE_DIR`.
+    """
+
+    container = containers().get('remotecontrol', dict()) if os.path.isfile(PATH) else dict()
+
+    return os.path.join(container.get('state_dir', STATE_DIR), filename)
+
+
+def adopt(legacy_path: str, path: str) -> None:
+    """Move a file written by an older version to `path`, unless there's one
+    already."""
+
+    if os.path.exists(path) or not os.path.isfile(legacy_path):
+        return
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    os.replace(legacy_path, path)
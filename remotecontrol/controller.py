@@ -1,46 +1,156 @@
 """Control acoustics experiments."""
 
-from time import sleep
-from typing import Dict
+import logging
+import threading
+from typing import Dict, List, Optional
 
-from remotecontrol import jigs, logger
+from remotecontrol import events, jigs
+from remotecontrol.metrics import metrics
+from remotecontrol.pipeline import Pipeline
+from remotecontrol.rig import DEFAULT, Rig, rigs
+from remotecontrol.scheduler import Scheduler
 
-
-logger.configure()
-
-SLEEP_BASELINE = 10
+RETRY_S = 0.05  # Poll interval of a jig held back by a full pipeline
 
 
 class Controller:
-    def __init__(self):
-        self.jigs = jigs.jigs
+    """Scheduler loop for the jigs of one rig (instrument chain).
+
+    Run one per rig, each in its own thread, see `start_all`.
+    """
+
+    def __init__(
+        self,
+        rig: Optional[Rig] = None,
+        registry: Optional[jigs.Registry] = None,
+        jig_table: Optional[Dict[str, jigs.Jig]] = None
+    ):
+        """
+        Args:
+            rig (Rig, optional): Defaults to the default rig.
+            registry (jigs.Registry, optional): Defaults to the rig's.
+            jig_table (dict[str, Jig], optional): Defaults to the configured jigs.
+        """
+
+        self.rig = rigs()[DEFAULT] if rig is None else rig
+        self.registry = jigs.registries[self.rig.name] if registry is None else registry
+        self.jigs = jigs.jigs() if jig_table is None else jig_table
+        self.scheduler = Scheduler()
+        self.pipeline = Pipeline(name=self.rig.name)
+        self._runs: Dict[str, jigs.Run] = dict()  # Scheduled run of each jig
+        self._synced_version = -1
+        self.registry.has_controller = True
+
+    def warm_up(self) -> None:
+        self.rig.warm_up()
 
     def check_which_jigs_are_running(self) -> Dict[str, jigs.Jig]:
-        active_jigs = dict()
-        
-        for name, jig in self.jigs.items():
-            if jig.status != jigs.Status.running.value:
-                continue
+        with self.registry.condition:
+            return dict(self.registry.active)
 
-            active_jigs[name] = jigg
+    def sync_schedule(self) -> None:
+        """Add newly started jigs to the scheduler and drop stopped ones.
 
-        return active_jigs
+        A jig restarted since the last call counts as both, so it's
+        rescheduled with its new settings.
 
-    # def check_if_experiment_is_finished(self):
-    #     for jig in self.jigs:
+        Call with `registry.condition` held. No-op unless a jig has started or
+        stopped since the last call.
+        """
 
+        if self._synced_version == self.registry.version:
+            return
 
-    def loop(self): #Add try except
-        while True:
-            active_jigs = self.check_which_jigs_are_running()
+        active_jigs = self.registry.active
+
+        for name, run in list(self._runs.items()):
+            if name in active_jigs and active_jigs[name].run is run:
+                continue
 
-            if len(active_jigs) == 0:
-                sleep(1)
+            self.scheduler.remove(name)
+            del self._runs[name]
+            self.pipeline.submit(self.jigs[name].finish, run)  # Runs after its last store
+
+        for name, jig in active_jigs.items():
+            if name in self._runs:
                 continue
 
-            sleep_duration_s = SLEEP_BASELINE / (len(active_jigs) + 1)
+            self.scheduler.add(name=name, interval=jig.settings.interval)
+            self._runs[name] = jig.run
+
+        self._synced_version = self.registry.version
+        self.registry.acknowledge(self._synced_version)
+
+    def _is_configured(self, name: str) -> bool:
+        """Whether the pulser already runs with the jig's settings, so pulsing
+        it first saves reconfiguring and settling. Call with the registry's
+        condition held."""
+
+        return self.registry.active[name].is_configured()
+
+    def step(self) -> None:
+        """Pulse the most overdue jig, or wait until one is due.
+
+        Waiting is on the registry's condition, so starting or stopping a jig
+        wakes the loop right away. Only acquisition happens here; storing the
+        capture is left to the pipeline so it overlaps with the next jig.
+        """
+
+        with self.registry.condition:
+            self.sync_schedule()
+            name = self.scheduler.pop_due(prefer=self._is_configured)
+
+            if name is None:
+                self.registry.condition.wait(timeout=self.scheduler.time_until_next())
+                return
+
+            jig = self.registry.active[name]
+            run = self._runs[name]
+
+        metrics.observe('scheduler_lag_seconds', self.scheduler.lag[name], jig=name)
+        settings = run.plan.settings
+
+        if settings.backpressure == 'block' and not self.pipeline.has_room(settings.priority):
+            metrics.inc('held_back_total', jig=name)  # Storage is behind, don't capture what can't be queued
+            self.scheduler.retry(name, delay=RETRY_S)
+            return
+
+        try:
+            captures = jig.acquire(run)
+        except Exception as e:
+            logging.exception(f'Acquisition failed for {name}.')
+            metrics.inc('failures_total', stage='acquire', jig=name)
+            events.publish('error', jig=name, stage='acquire', message=repr(e))
+            self.rig.invalidate()  # The instruments may be in any state now
+        else:
+            self.pipeline.submit(
+                jig.store,
+                captures,
+                run,
+                owner=name,
+                policy=settings.backpressure,
+                priority=settings.priority
+            )
+
+        missed = self.scheduler.reschedule(name)
+        metrics.inc('missed_deadlines_total', missed, jig=name)
+
+    def loop(self):
+        while True:
+            self.step()
+
+
+def start_all() -> List[Controller]:
+    """One controller thread per rig, so independent chains run in parallel."""
+
+    controllers = [Controller(rig=rig) for rig in rigs().values()]
+
+    for controller_ in controllers:
+        controller_.warm_up()
+        threading.Thread(
+            target=controller_.loop,
+            name=f'controller-{controller_.rig.name}',
+            daemon=True
+        ).start()
 
-            for active_jig in active_jigs.values():
-                jigs.Jig.pulse(active_jig)
-                sleep(sleep_duration_s)
-            
+    return controllers
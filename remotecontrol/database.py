@@ -1,77 +1,880 @@
-"""Create and write to a sqlite database. Our schema is one table per database
-because it goes well with out data "lake" (drops: https://github.com/dansteingart/drops).
+"""Create, write to and read from a sqlite database. Our schema is one waveform
+table (plus a tiny metadata table) per database because it goes well with out
+data "lake" (drops: https://github.com/dansteingart/drops).
 """
 
+import atexit
+from enum import Enum
 import json
+import logging
+import os
+import queue
 import sqlite3
-from typing import Dict, List, Union
+import threading
+from time import monotonic, time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type, Union
+import weakref
 
 import numpy as np
 
+from remotecontrol import codec, features
+from remotecontrol.catalog import Catalog
+from remotecontrol.metrics import metrics
+
 PATH = 'acoustics'
 TABLE = 'acoustics'
+METADATA_TABLE = 'metadata'
+# The primary key doubles as the time index (sqlite_autoindex_acoustics_1)
 TABLE_INITIALIZER= f'''CREATE TABLE IF NOT EXISTS {TABLE} (
     time REAL PRIMARY KEY,
     amps BLOB,
+    codec TEXT,
+    std BLOB,
+    position INTEGER,
+    {', '.join(f'{name} REAL' for name in features.NAMES)}
+)
+'''
+# Covering index, so trends over features never touch the pages holding waveforms
+FEATURES_INDEX_INITIALIZER = (
+    f'CREATE INDEX IF NOT EXISTS {TABLE}_features ON {TABLE} (time, {", ".join(features.NAMES)})'
+)
+METADATA_TABLE_INITIALIZER = f'''CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (
+    time REAL,
     metadata TEXT
 )
 '''
+# Columns added after the first experiments were run, migrated on connect
+ADDED_COLUMNS: Dict[str, str] = {
+    'codec': 'TEXT',
+    'std': 'BLOB',
+    'position': 'INTEGER',
+    **{name: 'REAL' for name in features.NAMES},
+}
+STD_KEY = 'std'  # Per-sample standard deviation of an averaged burst, raw float16
+CHUNK_SIZE = 256  # Rows per fetch when reading
+WAVEFORMS_SUFFIX = '.waveforms'  # Raw samples of the memmap backend, next to its sqlite index
+MEMMAP_DTYPES = ('float16', 'float32')
+INITIAL_ROWS = 1024  # Preallocated by the memmap backend, doubled when full
+BATCH_SIZE = 64  # Rows per commit
+COMMIT_INTERVAL_S = 5  # Max time a row waits before being committed
+OPEN_TIMEOUT_S = 10  # Max wait for an earlier run's memmap database of the same experiment to close
+WRITER_POLL_S = 0.5  # How often waiting callers check the writer is still alive
+QUEUE_SIZE = 256  # Rows waiting for the writer; encoded rows can't be dropped (deltas), so writers block when full
+
+Payload = Union[float, int, list, np.ndarray]
+
+
+class Job(Enum):
+    """Messages to the writer thread."""
 
-Payload = Union[float, int]#, np.ndarray]
+    row = 'row'
+    metadata = 'metadata'
+    flush = 'flush'
+    close = 'close'
 
 
 class Database:
     """Writes to a local database that is synced with drops using syncthing.
 
+    Writes are queued and a dedicated writer thread, which owns the
+    connection, inserts them in batches with executemany. A batch is committed
+    once it holds `batch_size` rows or its oldest row is `commit_interval_s`
+    old, whichever comes first. WAL mode lets readers (syncthing, the GUI)
+    read while we write.
+
     Attributes:
-        self.client: The mqtt-client responsible for starting and
-            maintaining the connection.
+        self.path (str): Database location.
+        self.queue (queue.Queue): Pending jobs for the writer thread, bounded
+            so a stalled disk pushes back on the pipeline instead of growing.
 
     Example:
-        db = database.Database(machine='brix2', path='INL_GT_DE_2022_08_01_1')
+        db = database.Database(db_filename='INL_GT_DE_2022_08_01_1')
         while *data is being updated*:
-            db.write(payload, table)
+            db.write(payload)
+        db.close()
     """
 
-    query: str = f'INSERT INTO {TABLE} (time, amps) VALUES (?, ?)'
+    query: str = (
+        f'INSERT INTO {TABLE} (time, amps, codec, position, std, {", ".join(features.NAMES)}) '
+        f'VALUES ({", ".join("?" * (5 + len(features.NAMES)))})'
+    )
     
-    def __init__(self, db_filename: str):
+    def __init__(
+        self,
+        db_filename: str,
+        codec_spec: codec.Spec = codec.Spec(),
+        catalog: Optional[Catalog] = None,
+        batch_size: int = BATCH_SIZE,
+        commit_interval_s: float = COMMIT_INTERVAL_S,
+        queue_size: int = QUEUE_SIZE
+    ):
         """
         Args:
             db_filename (str): Generally stick to experiment ID.
+            codec_spec (codec.Spec, optional): How waveforms are encoded.
+                Defaults to raw float16.
+            catalog (Catalog, optional): Told about every commit.
+            batch_size (int, optional): Rows per commit.
+            commit_interval_s (float, optional): Max time a row waits before
+                being committed [s].
+            queue_size (int, optional): Max queued jobs, `write` blocks
+                beyond.
         """
 
-        database: str = f'{PATH}/{db_filename}.sqlite3'
-        self.connection = sqlite3.connect(database=database)
-        self.cursor = self.connection.cursor()
-        self.cursor.execute(TABLE_INITIALIZER)
+        os.makedirs(PATH, exist_ok=True)
+        self.db_filename = db_filename
+        self.path: str = f'{PATH}/{db_filename}.sqlite3'
+        self.catalog = catalog
+        self.batch_size = batch_size
+        self.commit_interval_s = commit_interval_s
+        self.encoder = codec.Encoder(codec_spec)
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.closed = False
+        self.error: Optional[Exception] = None  # Why the writer thread died, if it did
+        self._restart_chain = False  # Set by the writer when rows were dropped, so deltas don't build on them
+
+        connected = threading.Event()
+        self.thread = threading.Thread(
+            target=self._run,
+            args=(connected,),
+            name=f'database-{db_filename}',
+            daemon=True
+        )
+        self.thread.start()
+        connected.wait()
+
+        if self.error is not None:
+            self.closed = True
+            raise self.error
+
+        _open.add(self)
+
+    @classmethod
+    def validate(cls, codec_spec: codec.Spec) -> None:
+        """Raise ValueError if this backend can't store `codec_spec`."""
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(database=self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')  # Durable at checkpoints, no fsync per commit in WAL
+        connection.execute(TABLE_INITIALIZER)
+        connection.execute(METADATA_TABLE_INITIALIZER)
+        self._migrate(connection)
+        connection.execute(FEATURES_INDEX_INITIALIZER)
+        connection.commit()
+
+        return connection
 
     @staticmethod
-    def _parse_parameters(parameters: List[Payload]) -> tuple:
+    def _migrate(connection: sqlite3.Connection) -> None:
+        """Bring databases from older versions up to the current schema."""
+
+        columns = {row[1] for row in connection.execute(f'PRAGMA table_info({TABLE})')}
+
+        for column, type_ in ADDED_COLUMNS.items():
+            if column not in columns:
+                connection.execute(f'ALTER TABLE {TABLE} ADD COLUMN {column} {type_}')
+
+        if 'metadata' in columns:  # Metadata used to be stored as rows with NULL time
+            connection.execute(
+                f'INSERT INTO {METADATA_TABLE} (metadata) '
+                f'SELECT metadata FROM {TABLE} WHERE time IS NULL'
+            )
+            connection.execute(f'DELETE FROM {TABLE} WHERE time IS NULL')
+
+    def _run(self, connected: threading.Event) -> None:
+        """Writer thread. The only place the connection is touched.
+
+        If it fails, the error is kept in `error` (raised by the constructor
+        if connecting failed) and the database closes itself so no caller
+        waits on it.
+        """
+
+        try:
+            connection = self._connect()
+        except Exception as e:
+            self.error = e
+            connected.set()
+            return
+
+        connected.set()
+
+        try:
+            self._loop(connection)
+        except Exception as e:
+            logging.exception(f'Writer of {self.path} died, dropping what is queued.')
+            self.error = e
+            self.closed = True
+            _open.discard(self)
+            connection.close()
+            self._drain()
+
+    def _drain(self) -> None:
+        """Discard queued jobs, releasing anyone waiting on them."""
+
+        while True:
+            try:
+                _, data = self.queue.get_nowait()
+            except queue.Empty:
+                return
+
+            if isinstance(data, threading.Event):
+                data.set()
+
+    def _loop(self, connection: sqlite3.Connection) -> None:
+        rows: List[tuple] = list()
+        deadline: float = 0.0
+
+        while True:
+            timeout = max(deadline - monotonic(), 0) if len(rows) > 0 else None
+
+            try:
+                job, data = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                job, data = Job.flush, None
+
+            if job is Job.row:
+                if len(rows) == 0:
+                    deadline = monotonic() + self.commit_interval_s
+
+                rows.append(data)
+
+                if len(rows) < self.batch_size:
+                    continue
+
+            if job is Job.metadata:
+                connection.execute(f'INSERT INTO {METADATA_TABLE} (time, metadata) VALUES (?, ?)', data)
+
+            self._commit(connection, rows)
+            rows = list()
+
+            if job is Job.close:
+                connection.close()
+
+            if isinstance(data, threading.Event):
+                data.set()
+
+            if job is Job.close:
+                return
+
+    def _commit(self, connection: sqlite3.Connection, rows: List[tuple]) -> None:
+        """Insert and commit a batch. If that fails, e.g. a clashing time or a
+        full disk, each row is retried on its own so only the failing ones are
+        dropped."""
+
+        try:
+            with metrics.timer('commit_seconds', database=self.db_filename):
+                connection.executemany(self.query, rows)
+                connection.commit()
+        except sqlite3.Error:
+            connection.rollback()
+            logging.exception(f'Batch of {len(rows)} rows failed, retrying them one by one.')
+            rows = self._commit_each(connection, rows)
+
+        if self.catalog is not None and len(rows) > 0:
+            n_bytes = sum(self._stored_bytes(row) for row in rows)
+            self.catalog.record_write(self.db_filename, rows=len(rows), n_bytes=n_bytes)
+
+    def _commit_each(self, connection: sqlite3.Connection, rows: List[tuple]) -> List[tuple]:
+        """
+        Returns:
+            list[tuple]: Rows that made it.
+        """
+
+        committed = list()
+
+        for row in rows:
+            try:
+                connection.execute(self.query, row)
+                connection.commit()
+            except sqlite3.Error as e:
+                connection.rollback()
+                logging.error(f'Dropped the row at time {row[0]} of {self.path}: {e}')
+                continue
+
+            committed.append(row)
+
+        self._dropped(len(rows) - len(committed))
+
+        return committed
+
+    def _dropped(self, n_rows: int) -> None:
+        if n_rows == 0:
+            return
+
+        self._restart_chain = True
+        metrics.inc('dropped_total', n_rows, stage='commit', database=self.db_filename)
+
+        if self.catalog is not None:
+            self.catalog.record_drop(self.db_filename, rows=n_rows)
+
+    def _stored_bytes(self, row: tuple) -> int:
+        return len(row[1])
+
+    def _put(self, job: Job, data: Any = None) -> None:
+        if self.closed:
+            logging.warning(f'{self.path} is closed, dropping {job.value}.')
+            return
+
+        self._enqueue((job, data))
+
+    def _enqueue(self, item: tuple) -> bool:
+        """Put, waiting for room unless the writer died meanwhile.
+
+        Returns:
+            bool: False if it died.
+        """
+
+        while True:
+            try:
+                self.queue.put(item, timeout=WRITER_POLL_S)
+                return True
+            except queue.Full:
+                if not self.thread.is_alive():
+                    return False
+
+    def _wait(self, done: threading.Event) -> None:
+        """Wait for the writer to get to `done`, or to die."""
+
+        while not done.wait(timeout=WRITER_POLL_S):
+            if not self.thread.is_alive():
+                return
+
+    def _encode(self, waveform: np.ndarray) -> Tuple[Optional[bytes], str, Optional[int]]:
+        """
+        Returns:
+            tuple[bytes | None, str, int | None]: amps BLOB, codec header and
+                position in an external waveform file (None here).
+        """
+
+        if self._restart_chain:
+            self._restart_chain = False
+            self.encoder.restart()
+
+        blob, header = self.encoder.encode(waveform)
+
+        return sqlite3.Binary(blob), header, None
+
+    def _parse_parameters(self, parameters: List[Payload]) -> tuple:
+        """Encodes waveforms, appending their codec header and position last
+        (matches query)."""
+
         parsed = list()
+        header = position = None
 
         for parameter in parameters:
-            if isinstance(parameter, list):
-                parsed.append(sqlite3.Binary(np.array(parameter, dtype=np.float16)))
+            if isinstance(parameter, (list, np.ndarray)):
+                blob, header, position = self._encode(np.asarray(parameter))
+                parsed.append(blob)
                 continue
 
             parsed.append(parameter)
 
-        return tuple(parsed)
+        return (*parsed, header, position)
     
     def write_metadata(self, metadata: dict) -> None:
         metadata_json: str = json.dumps(metadata)
-        query: str = f'INSERT INTO {TABLE} (metadata) VALUES (?)'
-        self.cursor.execute(query, (metadata_json,))
+        self._put(Job.metadata, (time(), metadata_json))
     
-    def write(self, payload: Dict[str, Payload]):
-        """Writes data out to Drops.
+    def write(self, payload: Dict[str, Payload]) -> int:
+        """Queues data to be written out to Drops.
 
+        Returns immediately; the row is committed with the next batch. Encoding
+        happens on the calling thread and is stateful (deltas), so call from
+        one thread only.
 
+        Args:
+            payload (dict): time and amps, optionally std (stored as raw
+                float16, outside the delta chain) and any of `features.NAMES`.
+
+        Returns:
+            int: Size of the encoded waveform(s) [bytes].
         """
 
-        parameters = self._parse_parameters(parameters=list(payload.values()))
-        self.cursor.execute(Database.query, parameters)
-        self.connection.commit()
+        if self.closed:  # Before encoding, which may touch files close() released
+            logging.warning(f'{self.path} is closed, dropping {Job.row.value}.')
+            return 0
+
+        extra = (STD_KEY, *features.NAMES)
+        std = payload.get(STD_KEY)
+        parameters: Tuple = self._parse_parameters(
+            parameters=[value for key, value in payload.items() if key not in extra]
+        )
+        std_blob = None if std is None else sqlite3.Binary(np.asarray(std, dtype=np.float16).tobytes())
+        values = tuple(None if payload.get(name) is None else float(payload[name]) for name in features.NAMES)
+        self._put(Job.row, (*parameters, std_blob, *values))
+
+        return sum(len(parameter) for parameter in (*parameters, std_blob) if isinstance(parameter, bytes))
+
+    def flush(self) -> None:
+        """Block until everything queued so far is committed."""
+
+        if self.closed:
+            return
+
+        done = threading.Event()
+
+        if self._enqueue((Job.flush, done)):
+            self._wait(done)
+
+    def close(self) -> None:
+        """Commit what's queued and stop the writer. Later writes are dropped."""
+
+        if self.closed:
+            return
+
+        done = threading.Event()
+        self.closed = True
+
+        if self._enqueue((Job.close, done)):
+            self._wait(done)
+
+        _open.discard(self)
+
+
+class MemmapDatabase(Database):
+    """Waveforms appended to a raw file that can be memory-mapped as one 2-D
+    array, with the sqlite database as the index.
+
+    Every waveform of an experiment must have the same shape. The file grows
+    in preallocated steps and is trimmed to its rows on close. Index rows hold
+    time, features etc. as usual, with `position` pointing into the file
+    instead of an amps BLOB, so metadata, features and the catalog work
+    unchanged. Only rows committed to the index are visible to readers.
+
+    Only float16 and float32 without delta or compression, since rows have to
+    be fixed-width.
+
+    Example:
+        db = database.MemmapDatabase(db_filename='INL_GT_DE_2022_08_01_1')
+        db.write(payload)
+        db.close()
+        times, waveforms = database.load('INL_GT_DE_2022_08_01_1')  # Zero-copy
+    """
+
+    def __init__(
+        self,
+        db_filename: str,
+        codec_spec: codec.Spec = codec.Spec(),
+        catalog: Optional[Catalog] = None,
+        batch_size: int = BATCH_SIZE,
+        commit_interval_s: float = COMMIT_INTERVAL_S,
+        queue_size: int = QUEUE_SIZE
+    ):
+        """
+        Raises:
+            ValueError: If `codec_spec` isn't fixed-width, or an earlier
+                instance of the same experiment, e.g. of a run that is still
+                wrapping up, isn't closed within `OPEN_TIMEOUT_S`.
+        """
+
+        self.validate(codec_spec)
+        os.makedirs(PATH, exist_ok=True)
+        self.waveforms_path: str = f'{PATH}/{db_filename}{WAVEFORMS_SUFFIX}'
+        self.dtype = np.dtype(codec_spec.dtype)
+        self.shape: Optional[Tuple[int, ...]] = None
+        self.rows: int = 0
+        self._fd: Optional[int] = None
+        self._fd_lock = threading.Lock()  # So close() can't release the fd mid-write
+        self._claim()
+
+        try:
+            self._resume(db_filename)
+            self.capacity: int = self.rows
+            self._fd = os.open(self.waveforms_path, os.O_RDWR | os.O_CREAT, 0o644)
+            super().__init__(db_filename, codec_spec, catalog, batch_size, commit_interval_s, queue_size)
+        except Exception:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+            self._release()
+            raise
+
+    def _claim(self) -> None:
+        """Become the only open instance of the file. Rows are appended
+        after the last indexed one, so two would overwrite each other's."""
+
+        with _memmaps_condition:
+            if not _memmaps_condition.wait_for(lambda: self.waveforms_path not in _memmaps, timeout=OPEN_TIMEOUT_S):
+                raise ValueError(f'{self.waveforms_path} is still open, e.g. by a run that is wrapping up.')
+
+            _memmaps[self.waveforms_path] = self
+
+    def _release(self) -> None:
+        with _memmaps_condition:
+            if _memmaps.get(self.waveforms_path) is self:
+                del _memmaps[self.waveforms_path]
+                _memmaps_condition.notify_all()
+
+    @classmethod
+    def validate(cls, codec_spec: codec.Spec) -> None:
+        if codec_spec.dtype not in MEMMAP_DTYPES or codec_spec.delta or codec_spec.compression is not None:
+            raise ValueError(f'The memmap backend only stores raw {MEMMAP_DTYPES}, got {codec_spec}.')
+
+    @property
+    def row_nbytes(self) -> int:
+        return 0 if self.shape is None else int(np.prod(self.shape)) * self.dtype.itemsize
+
+    def _resume(self, db_filename: str) -> None:
+        """Continue after the last indexed row of a restarted experiment;
+        anything written after it never made it into the index."""
+
+        if not exists(db_filename):
+            return
+
+        index = _index(db_filename)
+
+        if index is None:
+            return
+
+        _, positions, header = index
+        self.dtype, self.shape = np.dtype(header['dtype']), tuple(header['shape'])
+        self.rows = int(positions.max()) + 1
+
+    def _encode(self, waveform: np.ndarray) -> Tuple[Optional[bytes], str, Optional[int]]:
+        if self.shape is None:
+            self.shape = waveform.shape
+
+        if waveform.shape != self.shape:
+            raise ValueError(f'Waveform shape {waveform.shape} differs from {self.shape}, memmap rows are fixed-width.')
+
+        with self._fd_lock:
+            if self._fd is None:
+                raise ValueError(f'{self.waveforms_path} is closed.')
+
+            if self.rows == self.capacity:
+                self.capacity = max(2 * self.capacity, INITIAL_ROWS)
+                os.ftruncate(self._fd, self.capacity * self.row_nbytes)  # Sparse, so preallocating is free
+
+            position = self.rows
+            os.pwrite(self._fd, np.ascontiguousarray(waveform, dtype=self.dtype).tobytes(), position * self.row_nbytes)
+            self.rows += 1
+
+        header = {
+            **codec.LEGACY_HEADER,
+            'dtype': self.dtype.name,
+            'shape': list(self.shape),
+            'backend': 'memmap',
+        }
+
+        return None, json.dumps(header), position
+
+    def _stored_bytes(self, row: tuple) -> int:
+        return self.row_nbytes
+
+    def write(self, payload: Dict[str, Payload]) -> int:
+        if self.closed:
+            return super().write(payload)
+
+        return super().write(payload) + self.row_nbytes
+
+    def close(self) -> None:
+        super().close()
+
+        with self._fd_lock:
+            if self._fd is None:
+                return
+
+            index = _index(self.db_filename)
+            indexed = 0 if index is None else int(index[1].max()) + 1  # Never cut off what readers map
+            os.ftruncate(self._fd, max(self.rows, indexed) * self.row_nbytes)
+            os.close(self._fd)
+            self._fd = None
+
+        self._release()
+
+
+BACKENDS: Dict[str, Type[Database]] = {'sqlite': Database, 'memmap': MemmapDatabase}
+_memmaps: Dict[str, MemmapDatabase] = dict()  # Open instances by waveforms path
+_memmaps_condition = threading.Condition()
+
+
+def exists(db_filename: str) -> bool:
+    return os.path.isfile(f'{PATH}/{db_filename}.sqlite3')
+
+
+def _connect_read_only(db_filename: str) -> sqlite3.Connection:
+    return sqlite3.connect(f'file:{PATH}/{db_filename}.sqlite3?mode=ro', uri=True)
+
+
+def check_every(every: int) -> None:
+    """Raise ValueError unless `every` is a valid decimation."""
+
+    if every < 1:
+        raise ValueError(f'every must be at least 1, got {every}.')
+
+
+def _range_start(connection: sqlite3.Connection, start: float) -> float:
+    """Back up to the keyframe of the delta chain `start` falls in."""
+
+    row = connection.execute(
+        f'SELECT codec FROM {TABLE} WHERE time >= ? ORDER BY time LIMIT 1', (start,)
+    ).fetchone()
+
+    if row is None or not codec.parse_header(row[0])['delta']:
+        return start
+
+    # Not `n` rows back, which overshoots if rows of the chain were dropped
+    keyframe = connection.execute(
+        f"SELECT time FROM {TABLE} WHERE time < ? AND json_extract(codec, '$.delta') = 0 "
+        f'ORDER BY time DESC LIMIT 1',
+        (start,)
+    ).fetchone()
+
+    return start if keyframe is None else keyframe[0]
+
+
+def _index(db_filename: str) -> Optional[Tuple[np.ndarray, np.ndarray, Dict]]:
+    """Times, positions and header of a memmap experiment's committed rows.
+
+    Returns:
+        tuple | None: None if it has no memmap rows.
+    """
+
+    connection = _connect_read_only(db_filename)
+
+    try:
+        rows = connection.execute(
+            f'SELECT time, position FROM {TABLE} WHERE position IS NOT NULL ORDER BY time'
+        ).fetchall()
+        first = connection.execute(f'SELECT codec FROM {TABLE} WHERE position IS NOT NULL LIMIT 1').fetchone()
+    except sqlite3.OperationalError:  # No position column, predates the memmap backend
+        return None
+    finally:
+        connection.close()
+
+    if len(rows) == 0:
+        return None
+
+    index = np.array(rows)
+
+    return index[:, 0], index[:, 1].astype(np.int64), codec.parse_header(first[0])
+
+
+def is_memmap(db_filename: str) -> bool:
+    return os.path.isfile(f'{PATH}/{db_filename}{WAVEFORMS_SUFFIX}')
+
+
+def load(db_filename: str) -> Tuple[np.ndarray, np.ndarray]:
+    """A whole memmap experiment as one array, without reading or copying it.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Times (rows,) and a read-only
+            np.memmap of waveforms (rows, *waveform shape), in the stored
+            dtype.
+    """
+
+    index = _index(db_filename)
+
+    if index is None:
+        return np.empty(0), np.empty((0,), dtype=np.float32)
+
+    times, positions, header = index
+    waveforms = np.memmap(
+        f'{PATH}/{db_filename}{WAVEFORMS_SUFFIX}',
+        dtype=header['dtype'],
+        mode='r',
+        shape=(int(positions.max()) + 1, *header['shape'])
+    )
+
+    if np.array_equal(positions, np.arange(len(positions))):
+        return times, waveforms[:len(positions)]
+
+    return times, waveforms[positions]  # Out of order, e.g. clock jumped back, so this copies
+
+
+def _read_memmap(
+    db_filename: str,
+    start: float,
+    end: float,
+    every: int,
+    chunk_size: int
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    times, waveforms = load(db_filename)
+    selected = np.flatnonzero((times >= start) & (times <= end))[::every]
+
+    for i in range(0, len(selected), chunk_size):
+        rows = selected[i:i + chunk_size]
+
+        yield times[rows], np.asarray(waveforms[rows], dtype=np.float32)
+
+
+def read(
+    db_filename: str,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    every: int = 1,
+    chunk_size: int = CHUNK_SIZE
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """Stream waveforms in a time range, chunk by chunk.
+
+    Only one chunk is in memory at a time, so this is safe for weeks-long
+    experiments. Reads go through their own read-only connection, which WAL
+    lets run alongside the writer. Delta rows that build on a row that was
+    never stored can't be decoded and are skipped.
+
+    Args:
+        db_filename (str): Experiment ID.
+        start (float, optional): Unix timestamp, inclusive. Defaults to the
+            first row.
+        end (float, optional): Unix timestamp, inclusive. Defaults to the last.
+        every (int, optional): Decimation—only every Nth row is returned.
+        chunk_size (int, optional): Rows fetched per round trip.
+
+    Yields:
+        tuple[np.ndarray, np.ndarray]: Times (rows,) and waveforms
+            (rows, *waveform shape) of each non-empty chunk.
+
+    Raises:
+        ValueError: If `every` is below 1, on the first chunk.
+    """
+
+    check_every(every)
+    start = -np.inf if start is None else start
+    end = np.inf if end is None else end
+
+    if is_memmap(db_filename):
+        yield from _read_memmap(db_filename, start, end, every, chunk_size)
+        return
+
+    connection = _connect_read_only(db_filename)
+    decoder = codec.Decoder()
+    index = 0  # Row number within [start, end], for decimation
+
+    try:
+        cursor = connection.execute(
+            f'SELECT time, amps, codec FROM {TABLE} WHERE time >= ? AND time <= ? ORDER BY time',
+            (_range_start(connection, start), end)
+        )
+
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+
+            if len(rows) == 0:
+                return
+
+            times = np.array([row[0] for row in rows])
+            in_range = times >= start
+            keep = np.zeros(len(rows), dtype=bool)
+            keep[in_range] = (index + np.arange(in_range.sum())) % every == 0
+            index += int(in_range.sum())
+
+            if not any(codec.parse_header(row[2])['delta'] for row in rows):
+                # No chain to follow, so only decode what's kept (and the last
+                # row in case the next chunk starts a chain off of it)
+                decode = keep.copy()
+                decode[-1] = True
+                rows = [row for row, decoded in zip(rows, decode) if decoded]
+                times, keep = times[decode], keep[decode]
+
+            waveforms = decoder.decode([row[1] for row in rows], [row[2] for row in rows])
+            keep &= ~decoder.broken  # Built on a row that was never stored
+
+            if keep.any():
+                yield times[keep], waveforms[keep]
+    finally:
+        connection.close()
+
+
+def read_std(db_filename: str, start: Optional[float] = None, end: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Standard deviation traces of averaged bursts in a time range.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Times (rows,) and traces
+            (rows, *waveform shape), only for rows that have one.
+    """
+
+    connection = _connect_read_only(db_filename)
+
+    try:
+        rows = connection.execute(
+            f'SELECT time, std, codec FROM {TABLE} '
+            f'WHERE std IS NOT NULL AND time >= ? AND time <= ? ORDER BY time',
+            (-np.inf if start is None else start, np.inf if end is None else end)
+        ).fetchall()
+    except sqlite3.OperationalError:  # No std column, predates bursts
+        rows = list()
+    finally:
+        connection.close()
+
+    if len(rows) == 0:
+        return np.empty(0), np.empty((0,), dtype=np.float32)
+
+    shape = codec.parse_header(rows[0][2])['shape']
+    traces = np.frombuffer(b''.join(row[1] for row in rows), dtype=np.float16)
+
+    return np.array([row[0] for row in rows]), traces.astype(np.float32).reshape(len(rows), *shape)
+
+
+def read_features(
+    db_filename: str,
+    names: Sequence[str] = features.NAMES,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+    every: int = 1
+) -> Dict[str, np.ndarray]:
+    """Feature trends in a time range, without decoding any waveform.
+
+    Args:
+        db_filename (str): Experiment ID.
+        names (Sequence[str], optional): Defaults to all features.
+        start (float, optional): Unix timestamp, inclusive.
+        end (float, optional): Unix timestamp, inclusive.
+        every (int, optional): Decimation—only every Nth row is returned.
+
+    Returns:
+        dict[str, np.ndarray]: "time" and each feature, NaN where it wasn't
+            computed.
+
+    Raises:
+        ValueError: If a name is unknown or `every` is below 1.
+    """
+
+    features.validate(names)
+    check_every(every)
+    connection = _connect_read_only(db_filename)
+
+    try:
+        # Decimated in sqlite, so skipped rows are never handed to Python
+        columns = ", ".join(("time", *names))
+        rows = connection.execute(
+            f'SELECT {columns} FROM ('
+            f'SELECT {columns}, ROW_NUMBER() OVER (ORDER BY time) - 1 AS i FROM {TABLE} WHERE time >= ? AND time <= ?'
+            f') WHERE i % ? = 0 ORDER BY time',
+            (-np.inf if start is None else start, np.inf if end is None else end, every)
+        ).fetchall()
+    except sqlite3.OperationalError:  # No feature columns, predates features
+        rows = list()
+    finally:
+        connection.close()
+
+    values = np.array(rows, dtype=np.float64).reshape(len(rows), len(names) + 1)
+
+    return {'time': values[:, 0], **{name: values[:, i + 1] for i, name in enumerate(names)}}
+
+
+def read_metadata(db_filename: str) -> List[dict]:
+    connection = _connect_read_only(db_filename)
+
+    try:
+        rows = connection.execute(f'SELECT metadata FROM {METADATA_TABLE} ORDER BY rowid').fetchall()
+    finally:
+        connection.close()
+
+    return [json.loads(row[0]) for row in rows]
+
+
+_open: 'weakref.WeakSet[Database]' = weakref.WeakSet()
+
+
+@atexit.register
+def close_all() -> None:
+    """Flush every open database, e.g. at shutdown."""
 
-        return self.cursor.lastrowid
+    for database in list(_open):
+        database.close()
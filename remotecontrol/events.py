@@ -0,0 +1,122 @@
+"""Push status transitions, pulses and errors to subscribers.
+
+Served as Server-Sent Events by /events, so dashboards get told when
+something happens rather than polling /status or the acoustics folder.
+
+Example:
+    events.publish('status', jig='pikachu', status='running')
+    for event in events.subscribe(last_id=0):
+        print(event.format())
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+import json
+import threading
+from time import time
+from typing import Deque, Dict, Iterator, List, Optional
+
+CAPACITY = 1024  # Events kept for slow or reconnecting subscribers
+KEEPALIVE_S = 15  # Max silence before subscribers get a keepalive
+
+
+@dataclass
+class Event:
+    """
+    Attributes:
+        id (int): Increasing sequence number, sent as the SSE id so clients
+            can resume with Last-Event-ID.
+        type (str): status, pulse or error.
+        data (dict): Event-specific, always including "jig".
+        time (float): Unix timestamp.
+    """
+
+    id: int
+    type: str
+    data: Dict
+    time: float = field(default_factory=time)
+
+    def format(self) -> str:
+        """
+        Returns:
+            str: text/event-stream message.
+        """
+
+        data = json.dumps({'time': self.time, **self.data})
+
+        return f'id: {self.id}\nevent: {self.type}\ndata: {data}\n\n'
+
+
+class Bus:
+    """Shared, bounded log of recent events.
+
+    Subscribers keep only a cursor into the log and all wait on one condition,
+    so a subscriber costs no polling and no per-subscriber queue. Publishing is
+    an append and a notify, cheap enough for the acquisition path.
+    """
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.condition = threading.Condition()
+        self._events: Deque[Event] = deque(maxlen=capacity)
+        self.last_id: int = 0
+
+    def publish(self, type_: str, **data) -> Event:
+        with self.condition:
+            self.last_id += 1
+            event = Event(id=self.last_id, type=type_, data=data)
+            self._events.append(event)
+            self.condition.notify_all()
+
+        return event
+
+    def since(self, last_id: int, timeout: Optional[float] = None) -> List[Event]:
+        """Events after `last_id`, waiting up to `timeout` for the first one.
+
+        Events that already dropped out of the log are skipped; the gap in ids
+        tells the subscriber.
+
+        Returns:
+            list[Event]: Possibly empty if nothing happened within `timeout`.
+        """
+
+        with self.condition:
+            self.condition.wait_for(lambda: self.last_id > last_id, timeout=timeout)
+
+            return [event for event in self._events if event.id > last_id]
+
+    def subscribe(
+        self,
+        last_id: Optional[int] = None,
+        keepalive_s: float = KEEPALIVE_S
+    ) -> Iterator[Optional[Event]]:
+        """Endless stream of events, None after `keepalive_s` without any.
+
+        Args:
+            last_id (int, optional): Resume after this event. Defaults to
+                only new events.
+            keepalive_s (float, optional): Defaults to 15 s.
+        """
+
+        # Ids past ours are from before a restart
+        last_id = self.last_id if last_id is None else min(last_id, self.last_id)
+
+        while True:
+            events = self.since(last_id, timeout=keepalive_s)
+
+            if len(events) == 0:
+                yield None
+                continue
+
+            yield from events
+            last_id = events[-1].id
+
+
+bus = Bus()
+
+
+def publish(type_: str, **data) -> Event:
+    return bus.publish(type_, **data)
+
+
+def subscribe(last_id: Optional[int] = None, keepalive_s: float = KEEPALIVE_S) -> Iterator[Optional[Event]]:
+    return bus.subscribe(last_id=last_id, keepalive_s=keepalive_s)
@@ -0,0 +1,95 @@
+"""Waveform features computed at ingest, stored next to each row.
+
+Trend plots and alarms over weeks-long experiments then read a few numbers
+per row instead of decoding every waveform. Each feature is vectorized over
+a whole burst, i.e. an array of shape (rows, samples).
+
+Times are in the units of the picoscope's delay/duration (µs), frequencies
+in their inverse (MHz). Without a duration, samples are the unit.
+
+Example:
+    values = features.extract(amps, names=('peak', 'tof'), delay=10, duration=10)
+    values['tof']  # One time of flight per row
+"""
+
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+
+TOF_THRESHOLD = 0.5  # Fraction of the peak the first arrival has to reach
+
+
+def peak(amps: np.ndarray, dt: float, delay: float) -> np.ndarray:
+    """Max absolute amplitude."""
+
+    return np.abs(amps).max(axis=1)
+
+
+def energy(amps: np.ndarray, dt: float, delay: float) -> np.ndarray:
+    """Integral of the squared amplitude."""
+
+    return np.einsum('ij,ij->i', amps, amps) * dt
+
+
+def tof(amps: np.ndarray, dt: float, delay: float) -> np.ndarray:
+    """Time of flight, i.e. when the amplitude first reaches `TOF_THRESHOLD`
+    of its peak."""
+
+    magnitude = np.abs(amps)
+    arrival = np.argmax(magnitude >= TOF_THRESHOLD * magnitude.max(axis=1, keepdims=True), axis=1)
+
+    return delay + arrival * dt
+
+
+def centroid(amps: np.ndarray, dt: float, delay: float) -> np.ndarray:
+    """Power-weighted mean frequency of the spectrum (FFT)."""
+
+    power = np.abs(np.fft.rfft(amps - amps.mean(axis=1, keepdims=True), axis=1)) ** 2
+    frequencies = np.fft.rfftfreq(amps.shape[1], d=dt)
+    total = power.sum(axis=1)
+
+    return np.divide(power @ frequencies, total, out=np.zeros_like(total), where=total > 0)
+
+
+FEATURES: Dict[str, Callable[[np.ndarray, float, float], np.ndarray]] = {
+    'peak': peak,
+    'energy': energy,
+    'tof': tof,
+    'centroid': centroid,
+}
+NAMES = tuple(FEATURES)  # Also the database columns
+
+
+def validate(names: Sequence[str]) -> None:
+    unknown = set(names) - set(FEATURES)
+
+    if len(unknown) > 0:
+        raise ValueError(f'Unknown features {sorted(unknown)}, use any of {NAMES}.')
+
+
+def extract(
+    amps: np.ndarray,
+    names: Sequence[str] = NAMES,
+    delay: float = 0.0,
+    duration: Optional[float] = None
+) -> Dict[str, np.ndarray]:
+    """
+    Args:
+        amps (np.ndarray): Waveforms, shape (rows, samples).
+        names (Sequence[str], optional): Features to compute. Defaults to all.
+        delay (float, optional): Time of the first sample.
+        duration (float, optional): Time spanned by all samples. Defaults to
+            one per sample.
+
+    Returns:
+        dict[str, np.ndarray]: One value per row, by feature name.
+    """
+
+    amps = np.asarray(amps, dtype=np.float32).reshape(len(amps), -1)
+
+    if amps.shape[1] == 0:
+        return {name: np.full(len(amps), np.nan) for name in names}
+
+    dt = 1.0 if duration is None else float(duration) / amps.shape[1]
+
+    return {name: FEATURES[name](amps, dt, float(delay)) for name in names}
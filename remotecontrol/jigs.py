@@ -1,11 +1,27 @@
+from collections import defaultdict
 from dataclasses import dataclass
 from enum import auto
-from time import sleep, time
-from typing import Dict
+from functools import lru_cache
+import json
+import logging
+import os
+import threading
+from time import time
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from aenum import Enum, unique
+import numpy as np
+from requests import Response
 
-from remotecontrol import database, mux, picoscope, pulser, utils
+from remotecontrol import catalog as catalog_, codec, database, events, features, mux, picoscope, pulser, utils
+from remotecontrol import journal as journal_
+from remotecontrol.metrics import metrics
+from remotecontrol.pipeline import POLICIES
+from remotecontrol.rig import DEFAULT, Rig, rigs
+from remotecontrol.ringbuffer import RingBuffer
+
+
+BURST_MODES = ('rows', 'mean')
 
 
 class Status(utils.ZeroBasedAutoEnum):
@@ -17,21 +33,40 @@ class Status(utils.ZeroBasedAutoEnum):
     error = auto()
 
 
-@dataclass
+@dataclass(frozen=True)
 class ExpSettings:
     """Experiment metadata.
     
-    Note that this is separate from any pulsing parameters.
+    Note that this is separate from any pulsing parameters. Frozen, as it's
+    part of the plan of a running experiment.
 
     Attributes:
         exp_duration_h (float): Duration of experiment [h].
         interval (float): Time passed between acoustic pulses [s].
         exp_id (str): (Preferably unique) experiment identifier.
+        burst (int): Scope captures per mux/pulser configuration, so the
+            switching and settling is paid once for all of them.
+        burst_mode (str): "rows" stores every capture of a burst, "mean"
+            stores their average plus a standard deviation trace.
+        features (tuple[str, ...] | None): Computed for and stored with every
+            row, see `features.NAMES`. Defaults to all of them.
+        backend (str): Waveform storage, "sqlite" (BLOB rows, any codec) or
+            "memmap" (one memory-mappable file, raw float16/float32).
+        backpressure (str): What gives when storage falls behind, see
+            `pipeline.POLICIES`.
+        priority (int): Above 0 keeps its cadence at the expense of other
+            jigs when storage falls behind.
     """
 
     exp_duration_h: float  # h
     interval: float  # s
     exp_id: str
+    burst: int = 1
+    burst_mode: str = 'rows'
+    features: Optional[Tuple[str, ...]] = None
+    backend: str = 'sqlite'
+    backpressure: str = 'block'
+    priority: int = 0
 
     def __post_init__(self):
         """Ensure correct typing.
@@ -45,8 +80,26 @@ class ExpSettings:
         (float and str).
         """
 
-        self.exp_duration_h = float(self.exp_duration_h)
-        self.interval = float(self.interval)
+        for field_, type_ in (('exp_duration_h', float), ('interval', float), ('burst', int), ('priority', int)):
+            object.__setattr__(self, field_, type_(getattr(self, field_)))
+
+        if self.interval <= 0:
+            raise ValueError(f'Interval must be positive, got {self.interval}.')
+
+        if self.burst < 1:
+            raise ValueError(f'Burst must be at least 1, got {self.burst}.')
+
+        if self.burst_mode not in BURST_MODES:
+            raise ValueError(f'Unknown burst mode {self.burst_mode}, use one of {BURST_MODES}.')
+
+        object.__setattr__(self, 'features', tuple(features.NAMES if self.features is None else self.features))
+        features.validate(self.features)
+
+        if self.backend not in database.BACKENDS:
+            raise ValueError(f'Unknown backend {self.backend}, use one of {tuple(database.BACKENDS)}.')
+
+        if self.backpressure not in POLICIES:
+            raise ValueError(f'Unknown backpressure policy {self.backpressure}, use one of {POLICIES}.')
 
     @property
     def exp_duration_s(self) -> float:
@@ -60,47 +113,583 @@ class ExpSettings:
         return self.exp_duration_h * 3600
 
 
+@dataclass(frozen=True)
+class PulsePlan:
+    """Everything a pulse needs, validated and rendered once at start.
+
+    Pulsing then only sends what's in here, it never parses the payload.
+
+    Attributes:
+        settings (ExpSettings): Typed experiment settings.
+        pulser_commands (tuple[str, ...]): Rendered pulser commands.
+        mux_commands (tuple[str, ...]): Rendered mux commands.
+        scope (picoscope.Picoscope): Typed capture parameters.
+        scope_body (bytes): Form-encoded capture request body.
+        codec_spec (codec.Spec): How waveforms are encoded, checked against
+            the settings' backend.
+    """
+
+    settings: ExpSettings
+    pulser_commands: Tuple[str, ...]
+    mux_commands: Tuple[str, ...]
+    scope: picoscope.Picoscope
+    scope_body: bytes
+    codec_spec: codec.Spec
+
+    @classmethod
+    def compile(
+        cls,
+        payload: Dict,
+        channel: mux.Channel,
+        pulser_properties: Optional[pulser.Properties] = None
+    ) -> 'PulsePlan':
+        """
+        Args:
+            payload (dict): Experiment parameters, see /start.
+            channel (mux.Channel): The jig's mux channel.
+            pulser_properties (pulser.Properties, optional): Already parsed
+                from payload["pulser"], e.g. shared by a bulk start.
+
+        Raises:
+            ValueError: If anything is missing or invalid.
+        """
+
+        try:
+            properties = pulser_properties or pulser.Properties(**payload['pulser'])
+            pulsing_params = payload['picoscope']
+            settings = utils.dataclass_from_dict(ExpSettings, payload)
+            codec_spec = utils.dataclass_from_dict(codec.Spec, payload.get('codec', dict()))
+            database.BACKENDS[settings.backend].validate(codec_spec)
+
+            return cls(
+                settings=settings,
+                pulser_commands=tuple(pulser.commands(properties)),
+                mux_commands=(mux.parse(module=channel.module, switch=channel.switch),),
+                scope=utils.dataclass_from_dict(picoscope.Picoscope, pulsing_params),
+                scope_body=picoscope.encode(pulsing_params),
+                codec_spec=codec_spec
+            )
+        except (KeyError, TypeError) as e:
+            raise ValueError(f'Invalid experiment parameters: {e!r}.') from e
+
+
+@dataclass(frozen=True)
+class Run:
+    """One start of a jig: what the controller schedules, and what its
+    captures are stored with even if the jig is restarted meanwhile.
+
+    Attributes:
+        plan (PulsePlan): Settings of the run.
+        database (database.Database): Where its captures go.
+    """
+
+    plan: PulsePlan
+    database: 'database.Database'
+
+
+@dataclass
+class Capture:
+    """Raw scope response, handed from acquisition to storage.
+
+    Attributes:
+        time (float): Unix timestamp of the capture.
+        response (Response): Undecoded picoscope response.
+    """
+
+    time: float
+    response: Response
+
+
+SYNC_TIMEOUT_S = 1  # Max wait for the controller to pick up a start/stop, it's usually ms
+_status_lock = threading.Lock()  # So a snapshot of many jigs never sees half a transition
+
+
+class Registry:
+    """Running jigs, updated only when a jig starts or stops.
+
+    The controller loop waits on `condition` instead of polling, so a /start
+    wakes it immediately. Lookups are O(1) in the number of configured jigs,
+    which matters once all 128 mux channels are in use.
+
+    The controller acknowledges each version it has synced to, which is how
+    a start/stop knows the jig has actually been (un)scheduled.
+
+    Attributes:
+        condition (threading.Condition): Guards `active` and `version`;
+            notified on every change.
+        active (dict[str, Jig]): Running jigs by name.
+        version (int): Bumped on every change so consumers can skip
+            re-syncing when nothing happened.
+        synced_version (int): Latest version the controller has applied.
+        has_controller (bool): Whether a controller consumes this registry.
+            If so, only it may wrap up (`Jig.finish`) stopped runs, after
+            their last queued capture is stored.
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.active: Dict[str, 'Jig'] = dict()
+        self.version: int = 0
+        self.synced_version: int = 0
+        self.has_controller: bool = False
+
+    def activate(self, jig: 'Jig') -> int:
+        with self.condition:
+            self.active[jig.name] = jig
+            self.version += 1
+            self.condition.notify_all()
+
+            return self.version
+
+    def deactivate(self, jig: 'Jig') -> int:
+        with self.condition:
+            self.active.pop(jig.name, None)
+            self.version += 1
+            self.condition.notify_all()
+
+            return self.version
+
+    def acknowledge(self, version: int) -> None:
+        """Called by the controller, with `condition` held, once synced."""
+
+        self.synced_version = version
+        self.condition.notify_all()
+
+    def wait_synced(self, version: int, timeout: float = SYNC_TIMEOUT_S) -> bool:
+        """
+        Returns:
+            bool: Whether the controller applied `version` within `timeout`,
+                False e.g. if no controller is running.
+        """
+
+        with self.condition:
+            return self.condition.wait_for(lambda: self.synced_version >= version, timeout=timeout)
+
+
+registries: Dict[str, Registry] = defaultdict(Registry)  # One per rig, by rig name
+registry = registries[DEFAULT]
+
+
 class Jig:
-    def __init__(self, mux: mux.Channel):
+    def __init__(
+        self,
+        name: str,
+        mux: mux.Channel,
+        rig: Optional[Rig] = None,
+        registry: Optional[Registry] = None,
+        catalog: Optional[catalog_.Catalog] = None,
+        journal: Optional[journal_.Journal] = None
+    ):
+        """
+        Args:
+            name (str): Jig name.
+            mux (mux.Channel): Mux channel of the jig's transducers.
+            rig (Rig, optional): Instrument chain it's wired to. Defaults to
+                the default rig.
+            registry (Registry, optional): Defaults to the rig's.
+            catalog (catalog.Catalog, optional): Defaults to the shared one.
+            journal (journal.Journal, optional): Defaults to the shared one.
+        """
+
+        self.name = name
         self.mux_ = mux
+        self.rig = rigs()[DEFAULT] if rig is None else rig
+        self.registry = registries[self.rig.name] if registry is None else registry
+        self.catalog = catalog_.default() if catalog is None else catalog
+        self.journal = journal_.default() if journal is None else journal
+        self.parameters: Dict = dict()
+        self.plan: Optional[PulsePlan] = None
+        self.database: Optional[database.Database] = None
+        self.run: Optional[Run] = None
+        self.recent = RingBuffer()
         self._status = Status.not_started
 
+    @property
+    def settings(self) -> ExpSettings:
+        return self.plan.settings
+
     @property
     def status(self) -> int:
         return self._status.value
 
+    def _set_status(self, status: Status) -> None:
+        with _status_lock:
+            self._status = status
+
+        events.publish(
+            'status',
+            jig=self.name,
+            status=status.name,
+            exp_id=self.parameters.get('exp_id')
+        )
+
     @property
-    def last_updated(self) -> str:
-        pass
+    def last_updated(self) -> float:
+        """
+        Returns:
+            float: Unix timestamp of the newest waveform, -1.0 if none yet.
+        """
+
+        return self.recent.last_time
+
+    def state(self) -> Dict:
+        """
+        Returns:
+            dict: Status, experiment, rig and newest waveform timestamp.
+        """
+
+        return {
+            'status': self.status,
+            'exp_id': self.parameters.get('exp_id'),
+            'rig': self.rig.name,
+            'last_updated': self.last_updated,
+        }
+
+    def start(
+        self,
+        payload,
+        plan: Optional[PulsePlan] = None,
+        wait: bool = True,
+        resume: bool = False
+    ):
+        """
+        A running jig is stopped first, i.e. its run is wrapped up as if
+        stopped and the controller reschedules it with the new settings. That
+        takes a new exp_id, the old run may still have captures to store.
+
+        Args:
+            payload (dict): Experiment parameters, see /start.
+            plan (PulsePlan, optional): Already compiled from payload, e.g.
+                by a bulk start.
+            wait (bool, optional): Return only once the controller has
+                scheduled the jig. Defaults to True.
+            resume (bool, optional): Continue an experiment from the journal,
+                appending to its database as if never interrupted.
+
+        Raises:
+            ValueError: If the payload is invalid, before anything is started,
+                or the experiment's memmap database is still open by an
+                earlier run that doesn't wrap up in time.
+        """
+
+        plan = plan or PulsePlan.compile(payload, self.mux_)
+
+        if self._status == Status.running:
+            if plan.settings.exp_id == self.settings.exp_id:
+                raise ValueError(f'{self.name} is already running {plan.settings.exp_id}, stop it first.')
 
-    def start(self, payload):
+            self.stop(wait=False)
+
+        # First, so the jig is left as it was if the database can't be opened
+        self.database = database.BACKENDS[plan.settings.backend](
+            db_filename=payload["exp_id"],
+            codec_spec=plan.codec_spec,
+            catalog=self.catalog
+        )
+        self.plan = plan
         self.parameters = payload
-        self._status = Status.running
-        
-        self.database = database.Database(db_filename=self.parameters["exp_id"])
-        self.database.write_metadata(self.parameters)
+        self.run = Run(plan=self.plan, database=self.database)
+        self.catalog.start(exp_id=self.parameters["exp_id"], jig=self.name)
+
+        if not resume:
+            self.database.write_metadata(self.parameters)
+            self.journal.append(jig=self.name, event='start', payload=self.parameters)
+
         # self.time_started = time()
-        sleep(1)  # To ensure correct status message is returned
+        self._set_status(Status.running)
+        version = self.registry.activate(self)
+
+        if wait:
+            self.registry.wait_synced(version)  # Scheduled, so the status is truthful
 
         return self.status
 
-    def stop(self):
-        self._status = Status.stopped
+    def stop(self, wait: bool = True):
+        """Returns once the controller won't pulse this jig again.
+
+        The controller then wraps up (`finish`) after the last capture is
+        stored, however long that takes. Without a controller running, we wrap
+        up here.
+
+        Args:
+            wait (bool, optional): Wait (up to `SYNC_TIMEOUT_S`) for the
+                controller to unschedule the jig. Defaults to True.
+        """
+
+        self._set_status(Status.stopped)
+
+        if len(self.parameters) > 0:
+            self.journal.append(jig=self.name, event='stop', payload=self.parameters)
+
+        version = self.registry.deactivate(self)
+
+        if not self.registry.has_controller:
+            self.finish()  # Nobody else will
+        elif wait:
+            self.registry.wait_synced(version)
+
+        return self.status
 
-    def _acoustify(self, pulsing_params: Dict[str, float]) -> None:
-        payload: Dict[str, float] = {'time': time()}
-        waveforms: Dict[str, list[float]] = picoscope.callback(
-            pulsing_params=pulsing_params
+    def finish(self, run: Optional[Run] = None) -> None:
+        """Flush and close the database of a run that's no longer running.
+
+        Args:
+            run (Run, optional): An earlier run. Defaults to the current one,
+                left alone while running.
+        """
+
+        if run is None:
+            if self._status == Status.running or self.database is None:
+                return
+
+            run = Run(plan=self.plan, database=self.database)
+
+        if run.database.closed:
+            return
+
+        run.database.close()
+        # Restarted with the same exp_id, whose catalog record is live again
+        restarted = self._status == Status.running and self.database.db_filename == run.database.db_filename
+
+        if not restarted:
+            self.catalog.stop(exp_id=run.database.db_filename)
+
+    def _acoustify(self, pulsing_params: bytes) -> Capture:
+        with metrics.timer('stage_seconds', stage='capture', jig=self.name):
+            return Capture(
+                time=time(),
+                response=self.rig.scope.capture(pulsing_params=pulsing_params)
+            )
+
+    def is_configured(self) -> bool:
+        """Whether the rig's pulser is already set up for this jig."""
+
+        return self.rig.pulser.applied(self.plan.pulser_commands)
+
+    def acquire(self, run: Optional[Run] = None) -> List[Capture]:
+        """Instrument-touching half of a pulse. Must not run concurrently.
+
+        Args:
+            run (Run, optional): Defaults to the current one.
+
+        Returns:
+            list[Capture]: `settings.burst` captures, one mux/pulser
+                configuration for all.
+        """
+
+        plan = self.plan if run is None else run.plan
+
+        # Pulser first so it settles while the mux switches
+        with metrics.timer('stage_seconds', stage='pulser', jig=self.name):
+            self.rig.pulser.apply(plan.pulser_commands)
+
+        with metrics.timer('stage_seconds', stage='mux', jig=self.name):
+            self.rig.mux.apply(plan.mux_commands)
+
+        with metrics.timer('stage_seconds', stage='settle', jig=self.name):
+            pulser.wait_until_ready(instrument=self.rig.pulser)
+            mux.wait_until_ready(instrument=self.rig.mux)
+
+        return [self._acoustify(pulsing_params=plan.scope_body) for _ in range(plan.settings.burst)]
+
+    @staticmethod
+    def _rows(captures: List[Capture], waveforms: List[picoscope.Waveforms], plan: PulsePlan) -> List[Dict]:
+        """Database rows of a burst, one per capture or one for all."""
+
+        if plan.settings.burst_mode == 'rows' or len(captures) == 1:
+            return [{'time': capture.time, **waveforms_} for capture, waveforms_ in zip(captures, waveforms)]
+
+        amps = np.stack([waveforms_[picoscope.KEY] for waveforms_ in waveforms]).astype(np.float32)
+
+        return [{
+            'time': captures[0].time,
+            picoscope.KEY: amps.mean(axis=0),
+            database.STD_KEY: amps.std(axis=0),
+        }]
+
+    @staticmethod
+    def _extract_features(rows: List[Dict], plan: PulsePlan) -> None:
+        """Add the configured features to each row, vectorized over the burst."""
+
+        if len(plan.settings.features) == 0:
+            return
+
+        values = features.extract(
+            np.stack([row[picoscope.KEY] for row in rows]),
+            names=plan.settings.features,
+            delay=plan.scope.delay,
+            duration=plan.scope.duration
+        )
+
+        for i, row in enumerate(rows):
+            row.update({name: float(value[i]) for name, value in values.items()})
+
+    def store(self, captures: List[Capture], run: Optional[Run] = None) -> None:
+        """Decode and persist a burst. Safe to run off the controller thread.
+
+        Args:
+            captures (list[Capture]): As returned by `acquire`.
+            run (Run, optional): The run they were acquired for. Defaults to
+                the current one.
+        """
+
+        run = Run(plan=self.plan, database=self.database) if run is None else run
+
+        try:
+            with metrics.timer('stage_seconds', stage='decode', jig=self.name):
+                waveforms: List[picoscope.Waveforms] = [picoscope.decode(capture.response) for capture in captures]
+
+            rows = self._rows(captures, waveforms, run.plan)
+
+            for row in rows:
+                self.recent.append(row['time'], row[picoscope.KEY])
+
+            with metrics.timer('stage_seconds', stage='features', jig=self.name):
+                self._extract_features(rows, run.plan)
+
+            with metrics.timer('stage_seconds', stage='encode', jig=self.name):
+                n_bytes = sum(run.database.write(row) for row in rows)
+        except Exception as e:
+            metrics.inc('failures_total', stage='store', jig=self.name)
+            events.publish('error', jig=self.name, stage='store', message=repr(e))
+            raise
+
+        metrics.inc('pulses_total', len(captures), jig=self.name)
+        metrics.inc('bytes_total', n_bytes, jig=self.name)
+        metrics.set('database_queue_depth', run.database.queue_depth, jig=self.name)
+        events.publish(
+            'pulse',
+            jig=self.name,
+            captures=len(captures),
+            time=rows[-1]['time'],
+            n_bytes=n_bytes,
+            **{name: rows[-1][name] for name in run.plan.settings.features}
         )
-        payload.update(waveforms)
-        self.database.write(payload)
 
+    def pulse(self):
+        self.store(self.acquire())
+
+
+def snapshot(jig_table: Dict[str, Jig], names: Optional[Iterable[str]] = None) -> Dict[str, Dict]:
+    """State of many jigs at one instant, no transition half applied.
+
+    Args:
+        jig_table (dict[str, Jig]): Jigs by name.
+        names (Iterable[str], optional): Subset to include. Defaults to all.
+
+    Returns:
+        dict[str, dict]: `Jig.state` by name.
+    """
+
+    names = jig_table.keys() if names is None else names
+
+    with _status_lock:
+        return {name: jig_table[name].state() for name in names}
+
+
+def _wait_synced(started: List[Jig]) -> List[Jig]:
+    """Wait once per registry rather than once per jig.
 
-    def pulse(self):#, pulser_, picoscope_, mux_):
-        mux.mux(channel=self.mux_)
-        pulser.set_properties(self.parameters["pulser"])
-        sleep(0.05)  # Needed! The time it takes the pulser to switch
-        self._acoustify(pulsing_params=self.parameters["picoscope"])
+    Returns:
+        list[Jig]: Jigs whose controller didn't sync in time.
+    """
+
+    registries_ = {id(jig.registry): jig.registry for jig in started}
+    unsynced = {
+        key for key, registry in registries_.items()
+        if not registry.wait_synced(registry.version)
+    }
+
+    return [jig for jig in started if id(jig.registry) in unsynced]
+
+
+def start_many(jig_table: Dict[str, Jig], payloads: Dict[str, Dict], shared: Optional[Dict] = None) -> None:
+    """Start several jigs with one round trip to each controller.
+
+    Args:
+        jig_table (dict[str, Jig]): Jigs by name.
+        payloads (dict[str, dict]): Per-jig parameters (at least exp_id) by
+            jig name, overriding `shared`.
+        shared (dict, optional): Parameters common to all, e.g. pulser,
+            picoscope, interval. Parsed once.
+
+    Raises:
+        ValueError: If any payload is invalid, before any jig is started.
+    """
+
+    shared = dict() if shared is None else shared
+    jigs_ = [jig_table[name] for name in payloads]
+    plans = dict()
+
+    try:
+        shared_properties = pulser.Properties(**shared['pulser']) if 'pulser' in shared else None
+    except TypeError as e:
+        raise ValueError(f'Invalid shared pulser parameters: {e!r}.') from e
+
+    for jig in jigs_:  # All valid or none started
+        properties = None if 'pulser' in payloads[jig.name] else shared_properties
+        plans[jig.name] = PulsePlan.compile({**shared, **payloads[jig.name]}, jig.mux_, pulser_properties=properties)
+
+    for jig in jigs_:
+        jig.start({**shared, **payloads[jig.name]}, plan=plans[jig.name], wait=False)
+
+    _wait_synced(jigs_)
+
+
+def stop_many(jig_table: Dict[str, Jig], names: Iterable[str]) -> None:
+    """Stop several jigs with one round trip to each controller."""
+
+    jigs_ = [jig_table[name] for name in names]
+
+    for jig in jigs_:
+        jig.stop(wait=False)  # Wrapped up here if no controller runs them
+
+    _wait_synced([jig for jig in jigs_ if jig.registry.has_controller])
+
+
+def resume(jig_table: Dict[str, Jig], journal: Optional[journal_.Journal] = None) -> List[str]:
+    """Warm restart: pick up where the journal left off.
+
+    Experiments that were running carry on appending to their databases;
+    stopped ones get their status and parameters back so they can still be
+    queried.
+
+    Args:
+        jig_table (dict[str, Jig]): Jigs by name.
+        journal (journal.Journal, optional): Defaults to the shared one.
+
+    Returns:
+        list[str]: Names of the resumed jigs.
+    """
+
+    journal = journal_.default() if journal is None else journal
+    resumed: List[Jig] = list()
+
+    for name, entry in journal.replay().items():
+        jig = jig_table.get(name)
+
+        if jig is None:
+            logging.warning(f'{name} is in the journal but no longer configured, not resuming it.')
+            continue
+
+        if entry.event == 'stop':
+            jig.parameters = entry.payload
+            jig._set_status(Status.stopped)
+            continue
+
+        try:
+            jig.start(entry.payload, wait=False, resume=True)
+        except Exception as e:
+            logging.exception(f'Could not resume {name}.')
+            events.publish('error', jig=name, stage='resume', message=repr(e))
+            continue
+
+        resumed.append(jig)
+
+    _wait_synced(resumed)
+    logging.info(f'Resumed {[jig.name for jig in resumed]} from the journal.')
+
+    return [jig.name for jig in resumed]
 
 
 @unique
@@ -115,13 +704,51 @@ class Switches(Enum):
     voltorb = 7
 
 
-jigs: Dict[str, Jig] = {
-    'pickachu': Jig(mux=mux.Channel(Switches.pikachu)),
-    'zapdos': Jig(mux=mux.Channel(Switches.zapdos)),
-    'magnemite': Jig(mux=mux.Channel(Switches.magnemite)),    
-    'jolteon': Jig(mux=mux.Channel(Switches.jolteon)),
-    'raichu': Jig(mux=mux.Channel(Switches.raichu)),
-    'electabuzz': Jig(mux=mux.Channel(Switches.electabuzz)),
-    'jigglypuff': Jig(mux=mux.Channel(Switches.jigglypuff)),
-    'voltorb': Jig(mux=mux.Channel(Switches.voltorb)),
-}
+JIGS_CONFIG = 'jigs.json'
+
+
+def load(path: str = JIGS_CONFIG) -> Dict[str, Jig]:
+    """Build the jig table from config.
+
+    The config maps jig names to mux channels, e.g.
+    {"pikachu": {"module": 0, "switch": 0}, ...}, and can hold up to all
+    128 channels of the Cytec CXAR/128. An optional "rig" assigns the jig to
+    an instrument chain other than the default one. Falls back to `Switches`
+    if the file doesn't exist.
+
+    Args:
+        path (str, optional): Config location. Defaults to 'jigs.json'.
+
+    Returns:
+        dict[str, Jig]: Jigs by name.
+    """
+
+    if not os.path.isfile(path):
+        return {
+            switch.name: Jig(name=switch.name, mux=mux.Channel(switch=switch.value))
+            for switch in Switches
+        }
+
+    with open(path, 'r') as json_file:
+        config = json.load(json_file)
+
+    jigs: Dict[str, Jig] = dict()
+
+    for name, channel in config.items():
+        rig = rigs()[channel.pop('rig', DEFAULT)]
+        jigs[name] = Jig(name=name, mux=mux.Channel(**channel), rig=rig)
+
+    for rig_name in rigs():
+        channels = [jig.mux_ for jig in jigs.values() if jig.rig.name == rig_name]
+
+        if len(channels) > mux.N_CHANNELS:
+            raise ValueError(f'{len(channels)} jigs on rig {rig_name}, its mux only has {mux.N_CHANNELS} channels.')
+
+    return jigs
+
+
+@lru_cache(maxsize=None)
+def jigs() -> Dict[str, Jig]:
+    """The configured jigs, loaded on first use."""
+
+    return load()
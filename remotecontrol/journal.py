@@ -0,0 +1,132 @@
+"""Append-only journal of jig starts and stops, for warm restarts.
+
+Jig state otherwise lives only in memory. Every transition is appended as one
+json line and fsynced, so after a crash or restart the running experiments
+can be resumed from the journal without rescanning the acoustics folder.
+
+Example:
+    journal.append(jig='pikachu', event='start', payload=payload)
+    for entry in journal.replay().values():
+        ...
+"""
+
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+import json
+import logging
+import os
+import threading
+from time import time
+from typing import Dict, List, Optional, Tuple
+
+from remotecontrol import config, utils
+
+FILENAME = 'journal.jsonl'  # In the state directory, see `config.state_path`
+LEGACY_PATH = 'acoustics/journal.jsonl'  # Before it moved out of the synced folder
+EVENTS = ('start', 'stop')
+
+
+@dataclass
+class Entry:
+    """
+    Attributes:
+        jig (str): Jig name.
+        event (str): start or stop.
+        payload (dict): The experiment's /start payload.
+        time (float): Unix timestamp.
+    """
+
+    jig: str
+    event: str
+    payload: Dict
+    time: float = 0.0
+
+
+class Journal:
+    """Transitions as json lines, compacted to the latest one per jig on
+    replay so the file never outgrows the number of jigs by much."""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path (str, optional): Defaults to journal.jsonl in the state
+                directory.
+        """
+
+        self.path = config.state_path(FILENAME) if path is None else path
+        self._lock = threading.Lock()
+
+    def append(self, jig: str, event: str, payload: Dict) -> None:
+        if event not in EVENTS:
+            raise ValueError(f'Unknown event {event}, use one of {EVENTS}.')
+
+        line = json.dumps(asdict(Entry(jig=jig, event=event, payload=payload, time=time())))
+
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+
+            with open(self.path, 'a') as journal_file:
+                journal_file.write(line + '\n')
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+
+    def _read(self) -> Tuple[List[Entry], bool]:
+        """
+        Returns:
+            tuple[list[Entry], bool]: Entries, and whether any line was torn.
+        """
+
+        if not os.path.isfile(self.path):
+            return list(), False
+
+        entries = list()
+        torn = False
+
+        with open(self.path, 'r') as journal_file:
+            for line in journal_file:
+                try:
+                    entries.append(utils.dataclass_from_dict(Entry, json.loads(line)))
+                except (json.JSONDecodeError, TypeError):
+                    logging.warning(f'Skipping torn line in {self.path}.')  # Crashed mid-write
+                    torn = True
+
+        return entries, torn
+
+    def replay(self) -> Dict[str, Entry]:
+        """Latest transition of every jig, compacting the file to just those.
+
+        Returns:
+            dict[str, Entry]: By jig name.
+        """
+
+        with self._lock:
+            entries, torn = self._read()
+            latest = {entry.jig: entry for entry in entries}
+
+            # Also drops a torn last line, the next append would continue it
+            if torn or len(entries) > len(latest):
+                self._compact(list(latest.values()))
+
+        return latest
+
+    def _compact(self, entries: List[Entry]) -> None:
+        """Atomic rewrite, call with the lock held."""
+
+        temporary = f'{self.path}.tmp'
+
+        with open(temporary, 'w') as journal_file:
+            journal_file.writelines(json.dumps(asdict(entry)) + '\n' for entry in entries)
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+
+        os.replace(temporary, self.path)
+
+
+@lru_cache(maxsize=None)
+def default() -> Journal:
+    """The shared journal, created on first use."""
+
+    journal = Journal()
+    config.adopt(LEGACY_PATH, journal.path)
+
+    return journal
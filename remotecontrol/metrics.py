@@ -0,0 +1,132 @@
+"""Low-overhead timers, counters and gauges, exposed in Prometheus text format.
+
+Example:
+    with metrics.timer('stage_seconds', stage='mux', jig='pikachu'):
+        mux.mux(channel)
+    metrics.inc('pulses_total', jig='pikachu')
+    metrics.render()  # Served by /metrics
+"""
+
+from bisect import bisect_left
+from contextlib import contextmanager
+import threading
+from time import perf_counter
+from typing import Dict, Iterator, List, Tuple
+
+PREFIX = 'remotecontrol_'
+# Seconds, spanning a fast serial write to a heavily averaged scope capture
+BUCKETS: Tuple[float, ...] = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+Labels = Tuple[Tuple[str, str], ...]
+Key = Tuple[str, Labels]
+
+
+def _key(name: str, labels: Dict[str, str]) -> Key:
+    return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+
+def _format_labels(labels: Labels, **extra: str) -> str:
+    pairs = list(labels) + list(extra.items())
+
+    if len(pairs) == 0:
+        return ''
+
+    return '{' + ','.join(f'{label}="{value}"' for label, value in pairs) + '}'
+
+
+class Histogram:
+    """Fixed-bucket histogram; observing is a bisect and two additions."""
+
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts: List[int] = [0] * (len(buckets) + 1)  # Last one is +Inf
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """Thread-safe store of all metrics, keyed by name and labels."""
+
+    def __init__(self):
+        self._histograms: Dict[Key, Histogram] = dict()
+        self._counters: Dict[Key, float] = dict()
+        self._gauges: Dict[Key, float] = dict()
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, **labels: str) -> None:
+        key = _key(name, labels)
+
+        with self._lock:
+            if key not in self._histograms:
+                self._histograms[key] = Histogram()
+
+            self._histograms[key].observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels: str) -> None:
+        key = _key(name, labels)
+
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name: str, value: float, **labels: str) -> None:
+        with self._lock:
+            self._gauges[_key(name, labels)] = value
+
+    def counter(self, name: str, **labels: str) -> float:
+        return self._counters.get(_key(name, labels), 0)
+
+    @contextmanager
+    def timer(self, name: str, **labels: str) -> Iterator[None]:
+        """Observe the time spent in the block, also if it raises."""
+
+        start = perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(name, perf_counter() - start, **labels)
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: Everything in Prometheus text exposition format (0.0.4).
+        """
+
+        lines: List[str] = list()
+        typed = set()
+
+        def declare(name: str, type_: str) -> None:
+            if name not in typed:
+                lines.append(f'# TYPE {PREFIX}{name} {type_}')
+                typed.add(name)
+
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                declare(name, 'counter')
+                lines.append(f'{PREFIX}{name}{_format_labels(labels)} {value}')
+
+            for (name, labels), value in sorted(self._gauges.items()):
+                declare(name, 'gauge')
+                lines.append(f'{PREFIX}{name}{_format_labels(labels)} {value}')
+
+            for (name, labels), histogram in sorted(self._histograms.items(), key=lambda item: item[0]):
+                declare(name, 'histogram')
+                cumulative = 0
+
+                for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else repr(bound)
+                    lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels, le=le)} {cumulative}')
+
+                lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {histogram.sum}')
+                lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
@@ -3,16 +3,20 @@ Well, it probably works for other Cytec models as wells.
 """
 
 from dataclasses import dataclass
-import json
+from functools import lru_cache
 from typing import Optional
 
+from remotecontrol import config
 from remotecontrol.nodeforwarder import NodeForwarder
 
-with open('docker.json', 'r') as json_file:
-    containers = json.load(json_file)
+N_CHANNELS = 128  # CXAR/128
 
 
-mux_: NodeForwarder = NodeForwarder(container=containers['mux'])
+@lru_cache(maxsize=None)
+def default() -> NodeForwarder:
+    """The default rig's mux, created on first use."""
+
+    return NodeForwarder(container=config.containers()['mux'])
 
 
 @dataclass
@@ -30,11 +34,17 @@ def parse(module: int, switch: int) -> str:
     return f'X{str(module)},{str(switch)}'
 
 
-def mux(channel: Channel):    
+def mux(channel: Channel, instrument: Optional[NodeForwarder] = None):
     payload = parse(module=channel.module, switch=channel.switch)
-    mux_.write(payload=payload)
+    (instrument or default()).apply([payload])  # No-op if already switched there
+
+
+def wait_until_ready(instrument: Optional[NodeForwarder] = None) -> None:
+    (instrument or default()).wait_until_ready()
 
 
-def clear():
+def clear(instrument: Optional[NodeForwarder] = None):
     """Generally not needed, but may be useful in some cases. Unlatches everything."""
-    mux_.write('C')
\ No newline at end of file
+    instrument = instrument or default()
+    instrument.write('C')
+    instrument.invalidate()  # Whatever X was last sent no longer holds
@@ -4,29 +4,207 @@ on top of it to simplify the calling functions for all the
 instruments we control through nfw.
 """
 
+from dataclasses import dataclass
 from functools import partial
-from typing import Dict, Optional
+import logging
+import re
+from time import monotonic, sleep
+from typing import Dict, List, Optional, Sequence
+from urllib.parse import quote
 
-import requests
+from remotecontrol import sessions, utils
+from remotecontrol.metrics import metrics
 
-BASE_IP: str = '192.168.0'
+POLL_INTERVAL_S = 0.005
+SEPARATOR = '\r\n'  # What writecf terminates each write with, so joined commands reach the serial port as if sent one by one
+SHADOW_TTL_S = 60  # Re-send unchanged commands after this long anyway, in case the instrument was reset behind our back
+REGISTER = re.compile(r'[A-Za-z]*')  # Leading letters, e.g. 'X' of 'X0,1' or 'G' of 'G300'
+
+
+def register(payload: str) -> str:
+    """The setting a command changes, i.e. its leading letters."""
+
+    return REGISTER.match(payload).group()
+
+
+@dataclass
+class Readiness:
+    """When an instrument is ready to be used after a write.
+
+    Can be overridden per container in docker.json, e.g.
+    {"pulser": {"ip": 2, "port": 9001, "settle_s": 0.02, "ack": true}}.
+
+    Attributes:
+        settle_s (float): Minimum time after the last write [s].
+        ack (bool): Also poll lastread until the instrument echoes the last
+            command back.
+        ack_timeout_s (float): Stop polling for the echo after this long [s].
+    """
+
+    settle_s: float = 0.0  # s
+    ack: bool = False
+    ack_timeout_s: float = 0.5  # s
+
+    def __post_init__(self):
+        self.settle_s = float(self.settle_s)
+        self.ack = bool(self.ack)
+        self.ack_timeout_s = float(self.ack_timeout_s)
 
 
 class NodeForwarder:
 
-    def __init__(self, container: Dict[str, int]):
+    def __init__(self, container: Dict[str, int], **readiness):
+        """
+        Args:
+            container (dict): docker.json entry. An optional "separator"
+                overrides the line terminator used to batch commands.
+            **readiness: Instrument-specific `Readiness` defaults,
+                overridden by container.
+        """
+
         self.container = container
+        self.separator: str = container.get('separator', SEPARATOR)
+        self.settings = sessions.Settings.from_container(container)
+        self.readiness = utils.dataclass_from_dict(Readiness, {**readiness, **container})
+        self.session = sessions.get(self.url, self.settings)
+        self.last_write: float = -float('inf')  # Monotonic timestamp
+        self.last_command: Optional[str] = None
+        self.acknowledged: Optional[str] = None  # Last command known to have been echoed
+        self.shadow: Dict[str, str] = dict()  # Last command sent per register, i.e. the instrument's state
+        self.shadowed_at: float = -float('inf')  # Monotonic timestamp the shadow was last built from scratch
 
         self.read = partial(self.execute, command='read')
-        self.write = partial(self.execute, command='writecf')
         self.lastread = partial(self.execute, command='lastread')
         self.flushbuffer = partial(self.execute, command='flushbuffer')
 
     @property
     def url(self):
-        return f"http://{BASE_IP}.{self.container['ip']}:{self.container['port']}"
+        return utils.make_url(utils.container_host(self.container), self.container['port'])
     
     def execute(self, command: str, payload: Optional[str] = None) -> str:
         url = f'{self.url}/{command}/{payload}'
-        
-        return requests.get(url).text
+        metrics.inc('instrument_requests_total', command=command, instrument=self.url)
+
+        return self.session.get(url, timeout=self.settings.timeout).text
+
+    def write(self, payload: str) -> str:
+        try:
+            response = self.execute(command='writecf', payload=payload)
+        except Exception:
+            self.invalidate()  # Unknown whether it reached the instrument
+            raise
+
+        self._wrote([payload])
+
+        return response
+
+    def _wrote(self, payloads: Sequence[str]) -> None:
+        self.last_write, self.last_command, self.acknowledged = monotonic(), payloads[-1], None
+        self.shadow.update((register(payload), payload) for payload in payloads)
+
+    def write_many(self, payloads: Sequence[str]) -> List[str]:
+        """Send several serial commands, in order, in one request.
+
+        The commands are joined by the line terminator, so the serial port
+        sees the same bytes as from separate writes, for one round trip.
+
+        Args:
+            payloads (Sequence[str]): Commands, e.g. ['M1', 'W444', 'G300'].
+
+        Returns:
+            list[str]: Response per command. Nodeforwarder answers a write as
+                a whole, so each command gets the response to the batch.
+        """
+
+        if len(payloads) == 0:
+            return list()
+
+        if len(payloads) == 1:
+            return [self.write(payloads[0])]
+
+        try:
+            response = self.execute(command='writecf', payload=quote(self.separator.join(payloads), safe=','))
+        except Exception:
+            self.invalidate()
+            raise
+
+        self._wrote(payloads)
+
+        return [response] * len(payloads)
+
+    def applied(self, payloads: Sequence[str]) -> bool:
+        """Whether all commands are already in effect, as far as we know."""
+
+        if monotonic() - self.shadowed_at > SHADOW_TTL_S:
+            return False
+
+        return all(self.shadow.get(register(payload)) == payload for payload in payloads)
+
+    def apply(self, payloads: Sequence[str]) -> List[str]:
+        """Bring the instrument to a state, sending only what changes it.
+
+        Commands that match the shadow (what was last sent for the same
+        register) are skipped. If nothing is sent, `last_write` stays put so
+        `wait_until_ready` needn't settle again.
+
+        Args:
+            payloads (Sequence[str]): Commands, e.g. ['M1', 'W444', 'G300'].
+
+        Returns:
+            list[str]: The commands actually sent.
+        """
+
+        if monotonic() - self.shadowed_at > SHADOW_TTL_S:
+            self.invalidate()
+
+        if len(self.shadow) == 0:
+            self.shadowed_at = monotonic()
+
+        changed = [payload for payload in payloads if self.shadow.get(register(payload)) != payload]
+        metrics.inc('instrument_commands_skipped_total', len(payloads) - len(changed), instrument=self.url)
+
+        if len(changed) > 0:
+            self.write_many(changed)
+
+        return changed
+
+    def invalidate(self) -> None:
+        """Forget the shadowed state, so the next `apply` sends everything.
+
+        Call whenever the instrument may have changed without us knowing,
+        e.g. after an error, a reconnect or a command that resets it.
+        """
+
+        self.shadow.clear()
+        self.shadowed_at = -float('inf')
+
+    def wait_until_ready(self) -> None:
+        """Block until the last write has taken effect.
+
+        That is until the instrument echoed it (if `ack`), and at least
+        `settle_s` after it was sent. Returns right away if the instrument has
+        been idle for longer than that.
+        """
+
+        if self.readiness.ack and self.last_command not in (None, self.acknowledged):
+            deadline = self.last_write + self.readiness.ack_timeout_s
+
+            while self.last_command not in self.lastread():
+                if monotonic() > deadline:
+                    logging.warning(f'{self.url} did not acknowledge {self.last_command}.')
+                    self.invalidate()
+                    break
+
+                sleep(POLL_INTERVAL_S)
+
+            self.acknowledged = self.last_command
+
+        remaining = self.last_write + self.readiness.settle_s - monotonic()
+
+        if remaining > 0:
+            sleep(remaining)
+
+    def warm_up(self) -> bool:
+        self.invalidate()  # (Re)connecting, the instrument may have restarted meanwhile
+
+        return sessions.warm_up(self.url, self.settings)
@@ -1,44 +1,130 @@
 """Interface with oscilloscopes from PicoTech, called picoscopes."""
 
 from dataclasses import asdict, dataclass
+from functools import lru_cache
+import io
 import json
-from typing import Dict, List
+from typing import Dict, List, Union
+from urllib.parse import urlencode
 
-import requests
+import numpy as np
+from requests import Response
 
+from remotecontrol import config, sessions, utils
 
-with open('docker.json', 'r') as json_file:
-    containers = json.load(json_file)
 
+READ_TIMEOUT_S = 30  # Captures with lots of averaging take a while
+NPY_MIME = 'application/x-npy'
+# Newer scope containers send a .npy body when asked, older ones ignore this and send json
+HEADERS = {'Accept': f'{NPY_MIME}, application/json;q=0.5', 'Content-Type': 'application/x-www-form-urlencoded'}
+KEY = 'amps'
 
-URL: str = f"http://192.168.0.{containers['picoscope']['ip']}:{containers['picoscope']['port']}/get_wave"
+Waveforms = Dict[str, Union[List[float], np.ndarray]]
 
 
-# @dataclass#(kw_only) <- TODO: Implement when py3.10
-# class Picoscope:
-#     """All the params that should should be passed
-#     to a pulsing picoscope, no more, no less.
+@dataclass(frozen=True)
+class Picoscope:
+    """All the params that should should be passed
+    to a pulsing picoscope, no more, no less.
 
-#     Change at your leisure.
-#     """
+    Change at your leisure.
+    """
+
+    delay: float
+    duration: float
+    voltage_range: float
+    avg_num: int = 64
+
+    def __post_init__(self):
+        """Convert from json strings and reject what the scope can't capture."""
+
+        for field_, type_ in (('delay', float), ('duration', float), ('voltage_range', float), ('avg_num', int)):
+            object.__setattr__(self, field_, type_(getattr(self, field_)))
+
+        if self.duration <= 0 or self.voltage_range <= 0 or self.avg_num < 1:
+            raise ValueError(f'Duration and voltage range must be positive and avg_num at least 1, got {self}.')
+
+
+def encode(pulsing_params: Dict[str, float]) -> bytes:
+    """Form-encode once what requests would otherwise re-encode every capture."""
+
+    return urlencode(pulsing_params).encode()
+
+
+class Scope:
+    """One picoscope container, i.e. its /get_wave endpoint."""
+
+    def __init__(self, container: dict):
+        self.base_url: str = utils.make_url(utils.container_host(container), container['port'])
+        self.url: str = f'{self.base_url}/get_wave'
+        self.settings = sessions.Settings.from_container(container, read_timeout=READ_TIMEOUT_S)
+        self.session = sessions.get(self.base_url, self.settings)
+
+    def capture(self, pulsing_params: Union[Dict[str, float], bytes]) -> Response:
+        """Queries raw data from oscilloscope, leaving decoding to the caller.
+
+        Args:
+            pulsing_params (dict | bytes): See Picoscope, or already `encode`d.
+
+        Returns:
+            Response: Undecoded response, binary (.npy) if the scope supports it.
+        """
+
+        return self.session.post(self.url, data=pulsing_params, headers=HEADERS, timeout=self.settings.timeout)
+
+    def warm_up(self) -> bool:
+        return sessions.warm_up(self.base_url, self.settings)
 
-#     delay: float
-#     duration: float
-#     voltage_range: float
-#     avg_num: int = 64
 
+@lru_cache(maxsize=None)
+def default() -> Scope:
+    """The default rig's picoscope, created on first use."""
 
-def callback(pulsing_params: Dict[str, float]) -> Dict[str, List[float]]:
+    return Scope(container=config.containers()['picoscope'])
+
+
+def capture(pulsing_params: Dict[str, float]) -> Response:
+    return default().capture(pulsing_params=pulsing_params)
+
+
+def _decode_npy(content: bytes) -> np.ndarray:
+    """Zero-copy .npy decode—the array is a view on the response body.
+
+    np.load would copy, so we only parse the header and point np.frombuffer at
+    whatever comes after it.
+    """
+
+    buffer = io.BytesIO(content)
+    read_header = {
+        (1, 0): np.lib.format.read_array_header_1_0,
+        (2, 0): np.lib.format.read_array_header_2_0,
+    }[np.lib.format.read_magic(buffer)]
+    shape, fortran_order, dtype = read_header(buffer)
+    array = np.frombuffer(content, dtype=dtype, offset=buffer.tell())
+
+    return array.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def decode(response: Response) -> Waveforms:
+    if response.headers.get('Content-Type', '').startswith(NPY_MIME):
+        return {KEY: _decode_npy(response.content)}
+
+    return json.loads(response.text)
+
+
+def callback(pulsing_params: Dict[str, float]) -> Waveforms:
     """Queries data from oscilloscope.
     
     Args:
         pulsing_params (Picoscope): See Picoscope.
         
     Returns:
-        dict[str: list[float]]: Single key-value pair with key='data' and value
-            acoustics pulse data.
+        dict[str: list[float] | np.ndarray]: Single key-value pair with
+            key='amps' and value acoustics pulse data.
     """
 
-    response = requests.post(URL, data=pulsing_params).text
-    
-    return json.loads(response)
+    return decode(capture(pulsing_params=pulsing_params))
+
+
+def warm_up() -> bool:
+    return default().warm_up()
@@ -0,0 +1,223 @@
+"""Run the storage half of a pulse off the controller thread.
+
+Only the stages that touch instruments (mux, pulser, scope) have to be
+serialized. Decoding and persisting a waveform is handed to a worker here, so
+it overlaps with switching the mux and settling the pulser for the next jig.
+
+The queue is bounded, so a slow disk or scope costs captures rather than
+memory. What gives when it's full is up to each experiment, see `POLICIES`.
+"""
+
+from collections import defaultdict, deque
+from dataclasses import dataclass
+import logging
+import threading
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+from remotecontrol.metrics import metrics
+
+WORKERS = 1  # More than one gives no ordering guarantees per database
+CAPACITY = 64  # Queued storage jobs, i.e. bursts waiting to be decoded
+RESERVE = 16  # Of those, only usable by priority jigs
+# block: the jig isn't pulsed until there's room, drop_oldest: its oldest queued
+# job makes room, decimate: every other job of it is dropped once half full
+POLICIES = ('block', 'drop_oldest', 'decimate')
+
+
+@dataclass
+class Job:
+    """
+    Attributes:
+        function (Callable): Run by a worker with `args`.
+        args (tuple): Positional arguments.
+        owner (str | None): Jig name, None for jobs that are never dropped.
+        priority (int): Jobs of higher priority evict lower ones when full.
+    """
+
+    function: Callable
+    args: tuple
+    owner: Optional[str] = None
+    priority: int = 0
+
+
+class Pipeline:
+    """Bounded FIFO of storage jobs consumed by worker thread(s).
+
+    Jigs without priority can fill the queue up to `capacity - reserve`, so
+    priority jigs always find room and keep their cadence through a stall.
+    When even that is used up, a priority jig evicts the oldest job of a
+    lower priority one.
+
+    Example:
+        pipeline = Pipeline()
+        capture = jig.acquire()
+        pipeline.submit(jig.store, capture, owner=jig.name, policy='drop_oldest')
+        ...
+        pipeline.stop()
+    """
+
+    def __init__(self, workers: int = WORKERS, capacity: int = CAPACITY, reserve: int = RESERVE, name: str = ''):
+        """
+        Args:
+            workers (int, optional): Number of worker threads. Defaults to 1.
+            capacity (int, optional): Max queued jobs. Jobs without owner
+                may exceed it.
+            reserve (int, optional): Part of capacity only priority jigs use.
+            name (str, optional): Label of its metrics, e.g. the rig name.
+        """
+
+        if not 0 <= reserve < capacity:
+            raise ValueError(f'Reserve must be in [0, {capacity}), got {reserve}.')
+
+        self.capacity = capacity
+        self.reserve = reserve
+        self.name = name
+        self.condition = threading.Condition()
+        self._jobs: Deque[Optional[Job]] = deque()
+        self._unfinished: int = 0
+        self._decimated: Dict[str, int] = defaultdict(int)
+        self.dropped: Dict[str, int] = defaultdict(int)  # By jig
+        self.threads: List[threading.Thread] = [
+            threading.Thread(target=self._work, name=f'pipeline-{i}', daemon=True)
+            for i in range(workers)
+        ]
+
+        for thread in self.threads:
+            thread.start()
+
+    @property
+    def depth(self) -> int:
+        return len(self._jobs)
+
+    def limit(self, priority: int = 0) -> int:
+        return self.capacity if priority > 0 else self.capacity - self.reserve
+
+    def has_room(self, priority: int = 0) -> bool:
+        with self.condition:
+            return len(self._jobs) < self.limit(priority)
+
+    def submit(
+        self,
+        function: Callable,
+        *args: Any,
+        owner: Optional[str] = None,
+        policy: str = 'block',
+        priority: int = 0
+    ) -> bool:
+        """Queue a job, applying `policy` if the queue is full.
+
+        Args:
+            function (Callable): Run by a worker with `args`.
+            owner (str, optional): Jig name. Jobs without one bypass the bound
+                and are never dropped, e.g. wrapping up a run.
+            policy (str, optional): See `POLICIES`. Defaults to block, i.e.
+                wait for room.
+            priority (int, optional): Above 0 may use the reserve and evict
+                lower priority jobs.
+
+        Returns:
+            bool: False if the job was dropped rather than queued.
+        """
+
+        job = Job(function=function, args=args, owner=owner, priority=priority)
+
+        with self.condition:
+            if owner is not None and not self._make_room(job, policy):
+                self._drop(owner)
+                return False
+
+            self._jobs.append(job)
+            self._unfinished += 1
+            self.condition.notify_all()
+
+        metrics.set('pipeline_depth', len(self._jobs), rig=self.name)
+
+        return True
+
+    def _make_room(self, job: Job, policy: str) -> bool:
+        """Call with the condition held.
+
+        Returns:
+            bool: False if `job` is to be dropped instead.
+        """
+
+        limit = self.limit(job.priority)
+
+        if policy == 'decimate' and len(self._jobs) >= limit // 2:
+            self._decimated[job.owner] += 1
+
+            if self._decimated[job.owner] % 2 == 1:
+                return False
+
+        while len(self._jobs) >= limit:
+            victim = self._victim(job, policy)
+
+            if victim is not None:
+                self._jobs.remove(victim)
+                self._unfinished -= 1
+                self._drop(victim.owner)
+            elif policy == 'block':
+                self.condition.wait()
+            else:
+                return False
+
+        return True
+
+    def _victim(self, job: Job, policy: str) -> Optional[Job]:
+        """Oldest job to evict for `job`: a lower priority one, else (unless
+        blocking) one of its own."""
+
+        queued = [queued for queued in self._jobs if queued is not None and queued.owner is not None]
+        lower = [queued for queued in queued if queued.priority < job.priority]
+
+        if len(lower) > 0:
+            return min(lower, key=lambda queued: queued.priority)
+
+        if policy == 'block':
+            return None
+
+        return next((queued for queued in queued if queued.owner == job.owner), None)
+
+    def _drop(self, owner: str) -> None:
+        self.dropped[owner] += 1
+        metrics.inc('dropped_total', stage='decode', jig=owner)
+
+    def _work(self) -> None:
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: len(self._jobs) > 0)
+                job = self._jobs.popleft()
+                self.condition.notify_all()  # Room for blocked submitters
+
+            metrics.set('pipeline_depth', len(self._jobs), rig=self.name)
+
+            if job is None:
+                self._done()
+                return
+
+            try:
+                job.function(*job.args)
+            except Exception:
+                logging.exception(f'{job.function.__qualname__} failed in pipeline.')
+            finally:
+                self._done()
+
+    def _done(self) -> None:
+        with self.condition:
+            self._unfinished -= 1
+            self.condition.notify_all()
+
+    def join(self) -> None:
+        """Block until every submitted job has run."""
+
+        with self.condition:
+            self.condition.wait_for(lambda: self._unfinished == 0)
+
+    def stop(self) -> None:
+        with self.condition:
+            self._jobs.extend([None] * len(self.threads))
+            self._unfinished += len(self.threads)
+            self.condition.notify_all()
+
+        for thread in self.threads:
+            thread.join()
@@ -1,28 +1,38 @@
 """Interface with Ultratek Pulser over nodeforwarder."""
 
 from dataclasses import dataclass
-from functools import partial
-import json
-from typing import Callable, Optional
+from functools import lru_cache
+from typing import List, Optional
 
+from remotecontrol import config
 from remotecontrol.nodeforwarder import NodeForwarder
 
 
-with open('docker.json', 'r') as json_file:
-    containers = json.load(json_file)
+SETTLE_S = 0.05  # Needed! The time it takes the pulser to switch
+PRF = 'P500'  # Pulse repetition rate
+GAIN_RANGE_DB = (0, 80)  # Receiver gain the pulser accepts
 
 
-pulser: NodeForwarder = NodeForwarder(container=containers['pulser'])
-PRF = 'P500'  # Pulse repetition rate
-turn_on: Callable[[], str] = partial(pulser.write, payload=PRF)
-turn_off: Callable[[], str] = partial(pulser.write, payload='P0')
+@lru_cache(maxsize=None)
+def default() -> NodeForwarder:
+    """The default rig's pulser, created on first use."""
+
+    return NodeForwarder(container=config.containers()['pulser'], settle_s=SETTLE_S)
+
+
+def turn_on(instrument: Optional[NodeForwarder] = None) -> str:
+    return (instrument or default()).write(payload=PRF)
+
+
+def turn_off(instrument: Optional[NodeForwarder] = None) -> str:
+    return (instrument or default()).write(payload='P0')
 
 
 class Properties:
     """These properties need to be tweaked for each use case."""
 
     def __init__(self, gain_dB: int, transducer_frequency_MHz: Optional[float] = 2.25, mode: Optional[int] = 1):
-        self.mode: str = f'M{mode}'
+        self.mode: str = f'M{int(mode)}'
         
         pulse_width_ns: str = self.parse_pulse_width(transducer_frequency_MHz)
         self.pulse_width: str = f'W{pulse_width_ns}'
@@ -32,13 +42,22 @@ class Properties:
 
     @staticmethod
     def parse_pulse_width(transducer_frequency_MHz: float) -> str:
-        pulse_width_ns = (1 / transducer_frequency_MHz) * 1e3
+        if float(transducer_frequency_MHz) <= 0:
+            raise ValueError(f'Transducer frequency must be positive, got {transducer_frequency_MHz}.')
+
+        pulse_width_ns = (1 / float(transducer_frequency_MHz)) * 1e3
 
         return str(int(pulse_width_ns))
 
     @staticmethod
-    def parse_gain(gain_dB: int) -> int:
-        """"""
+    def parse_gain(gain_dB: float) -> int:
+        """Also accepts json strings, e.g. "30"."""
+
+        gain_dB = float(gain_dB)
+
+        if not GAIN_RANGE_DB[0] <= gain_dB <= GAIN_RANGE_DB[1]:
+            raise ValueError(f'Gain must be within {GAIN_RANGE_DB} dB, got {gain_dB}.')
+
         return int(gain_dB * 10)
 
 
@@ -53,6 +72,19 @@ class Config:
     trigger_type: str = 'T0'  # internal
 
 
-def set_properties(properties: Properties):    
-    for message in vars(properties).values():
-        pulser.write(payload=message)
+def commands(properties: Properties) -> List[str]:
+    return list(vars(properties).values())
+
+
+def set_properties(properties: Properties, instrument: Optional[NodeForwarder] = None):
+    (instrument or default()).apply(commands(properties))  # Only what changed, in one round trip
+
+
+def is_set(properties: Properties, instrument: Optional[NodeForwarder] = None) -> bool:
+    """Whether the pulser already runs with these properties."""
+
+    return (instrument or default()).applied(commands(properties))
+
+
+def wait_until_ready(instrument: Optional[NodeForwarder] = None) -> None:
+    (instrument or default()).wait_until_ready()
@@ -0,0 +1,70 @@
+"""Instrument chains ("rigs"), each one mux → pulser → picoscope.
+
+Jigs on different rigs share no instruments, so every rig gets its own
+controller loop and acquisition scales with the number of rigs in the lab.
+
+docker.json describes the default rig with its top-level mux/pulser/picoscope
+entries, and any additional ones under "rigs", e.g.
+    {"mux": {...}, "pulser": {...}, "picoscope": {...}, "remotecontrol": {...},
+     "rigs": {"bench2": {"mux": {...}, "pulser": {...}, "picoscope": {...}}}}
+"""
+
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict
+
+from remotecontrol import config, mux, picoscope, pulser
+from remotecontrol.nodeforwarder import NodeForwarder
+
+DEFAULT = 'default'
+
+
+@dataclass
+class Rig:
+    name: str
+    mux: NodeForwarder
+    pulser: NodeForwarder
+    scope: picoscope.Scope
+
+    def warm_up(self) -> None:
+        """Open pooled connections to all instruments before the first pulse."""
+
+        self.mux.warm_up()
+        self.pulser.warm_up()
+        self.scope.warm_up()
+
+    def invalidate(self) -> None:
+        """Forget the shadowed mux and pulser state, e.g. after an error."""
+
+        self.mux.invalidate()
+        self.pulser.invalidate()
+
+
+def load(path: str = config.PATH) -> Dict[str, Rig]:
+    """
+    Args:
+        path (str, optional): Defaults to 'docker.json'.
+
+    Returns:
+        dict[str, Rig]: Rigs by name, always including the default one.
+    """
+
+    containers = config.containers(path)
+    rigs = {DEFAULT: Rig(name=DEFAULT, mux=mux.default(), pulser=pulser.default(), scope=picoscope.default())}
+
+    for name, chain in containers.get('rigs', dict()).items():
+        rigs[name] = Rig(
+            name=name,
+            mux=NodeForwarder(container=chain['mux']),
+            pulser=NodeForwarder(container=chain['pulser'], settle_s=pulser.SETTLE_S),
+            scope=picoscope.Scope(container=chain['picoscope'])
+        )
+
+    return rigs
+
+
+@lru_cache(maxsize=None)
+def rigs() -> Dict[str, Rig]:
+    """All rigs in docker.json, loaded on first use."""
+
+    return load()
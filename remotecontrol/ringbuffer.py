@@ -0,0 +1,81 @@
+"""Fixed-size in-memory history of a jig's latest waveforms.
+
+Lets live monitoring read the newest captures without touching the disk.
+"""
+
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+CAPACITY = 16  # Waveforms kept per jig
+
+
+class RingBuffer:
+    """Preallocated circular buffer of (time, waveform).
+
+    Storage is allocated on the first append, once the waveform shape is
+    known, and reallocated only if the shape changes (new experiment
+    parameters). Appending copies into the buffer, so nothing grows.
+
+    Example:
+        buffer = RingBuffer()
+        buffer.append(time(), waveform)
+        times, waveforms = buffer.latest(n=4)
+    """
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.times: np.ndarray = np.full(capacity, np.nan)
+        self.waveforms: Optional[np.ndarray] = None
+        self.count: int = 0  # Total appended, so count % capacity is the next slot
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return min(self.count, self.capacity)
+
+    @property
+    def last_time(self) -> float:
+        """
+        Returns:
+            float: Unix timestamp of the newest waveform, -1.0 if empty.
+        """
+
+        with self._lock:
+            if self.count == 0:
+                return -1.0
+
+            return float(self.times[(self.count - 1) % self.capacity])
+
+    def append(self, time: float, waveform: np.ndarray) -> None:
+        waveform = np.asarray(waveform)
+
+        with self._lock:
+            if self.waveforms is None or self.waveforms.shape[1:] != waveform.shape:
+                self.waveforms = np.empty((self.capacity, *waveform.shape), dtype=np.float32)
+                self.count = 0
+
+            slot = self.count % self.capacity
+            self.times[slot] = time
+            self.waveforms[slot] = waveform
+            self.count += 1
+
+    def latest(self, n: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies of the newest n entries, oldest first.
+
+        Args:
+            n (int, optional): Number of entries, capped at what's stored.
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: Times (n,) and waveforms (n, ...).
+        """
+
+        with self._lock:
+            n = min(n, len(self))
+
+            if n == 0:
+                return np.empty(0), np.empty((0,), dtype=np.float32)
+
+            slots = np.arange(self.count - n, self.count) % self.capacity
+
+            return self.times[slots], self.waveforms[slots]
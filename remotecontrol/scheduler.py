@@ -0,0 +1,212 @@
+"""Deadline-based scheduling of jigs.
+
+Each running jig gets its own next-due time in a priority queue (a heap), so
+every jig is pulsed at its own `ExpSettings.interval` regardless of how many
+others are active or how long the acquisition chain takes.
+"""
+
+from dataclasses import dataclass, field
+import heapq
+import logging
+from math import floor
+from time import monotonic
+from typing import Callable, Dict, List, Optional
+
+
+@dataclass(order=True)
+class Deadline:
+    """Heap entry. Only `due` is compared so the heap orders by time.
+
+    Attributes:
+        due (float): Monotonic timestamp at which the jig should be pulsed [s].
+        name (str): Jig name.
+        interval (float): Time between pulses [s].
+        cancelled (bool): Lazy deletion flag—removing from the middle of a
+            heap is O(n), skipping stale entries on pop is O(log n).
+    """
+
+    due: float
+    name: str = field(compare=False)
+    interval: float = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+class Scheduler:
+    """Priority queue of next-due times, one per running jig.
+
+    Next-due times are advanced from the *scheduled* time rather than from
+    when the pulse finished, so acquisition time is absorbed into the interval
+    instead of being added on top of it. If a jig falls more than one interval
+    behind, the missed slots are skipped (and counted) rather than fired
+    back-to-back.
+
+    Example:
+        scheduler = Scheduler()
+        scheduler.add('pikachu', interval=10)
+        name = scheduler.pop_due()
+        if name is not None:
+            jigs[name].pulse()
+            scheduler.reschedule(name)
+    """
+
+    def __init__(self, clock: Callable[[], float] = monotonic):
+        """
+        Args:
+            clock (Callable[[], float], optional): Time source. Defaults to
+                time.monotonic (injectable bc tests).
+        """
+
+        self.clock = clock
+        self._heap: List[Deadline] = list()
+        self._entries: Dict[str, Deadline] = dict()
+        self._in_flight: Dict[str, Deadline] = dict()
+        self.missed: Dict[str, int] = dict()
+        self.lag: Dict[str, float] = dict()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entries or name in self._in_flight
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._in_flight)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._entries) + list(self._in_flight)
+
+    def add(self, name: str, interval: float, due: Optional[float] = None) -> None:
+        """Schedule a jig. It fires immediately unless `due` is given.
+
+        Args:
+            name (str): Jig name.
+            interval (float): Time between pulses [s].
+            due (float, optional): Monotonic timestamp of the first pulse.
+        """
+
+        if interval <= 0:
+            raise ValueError(f'Interval must be positive, got {interval}.')
+
+        self.remove(name)
+        deadline = Deadline(
+            due=self.clock() if due is None else due,
+            name=name,
+            interval=interval
+        )
+        self._entries[name] = deadline
+        self.missed.setdefault(name, 0)
+        heapq.heappush(self._heap, deadline)
+
+    def remove(self, name: str) -> None:
+        deadline = self._entries.pop(name, None)
+
+        if deadline is not None:
+            deadline.cancelled = True
+
+        self._in_flight.pop(name, None)
+
+    def _peek(self) -> Optional[Deadline]:
+        while len(self._heap) > 0 and self._heap[0].cancelled:
+            heapq.heappop(self._heap)
+
+        if len(self._heap) == 0:
+            return None
+
+        return self._heap[0]
+
+    def time_until_next(self) -> Optional[float]:
+        """
+        Returns:
+            float | None: Seconds until the next jig is due (negative if late),
+                None if nothing is scheduled.
+        """
+
+        deadline = self._peek()
+
+        if deadline is None:
+            return None
+
+        return deadline.due - self.clock()
+
+    def pop_due(self, prefer: Optional[Callable[[str], bool]] = None) -> Optional[str]:
+        """Take the most overdue jig off the queue.
+
+        The jig is held "in flight" until `reschedule` is called.
+
+        Args:
+            prefer (Callable[[str], bool], optional): Among the jigs that are
+                due, take the most overdue one for which this is true, e.g.
+                one that needs no reconfiguring. Ignored once the most overdue
+                jig is more than its interval late, so others aren't starved.
+
+        Returns:
+            str | None: Jig name, None if no jig is due yet.
+        """
+
+        deadline = self._peek()
+        now = self.clock()
+
+        if deadline is None or deadline.due > now:
+            return None
+
+        bypassable = prefer is not None and now - deadline.due <= deadline.interval
+        preferred = None if not bypassable or prefer(deadline.name) else min(
+            (entry for entry in self._entries.values() if entry.due <= now and prefer(entry.name)),
+            default=None
+        )
+
+        if preferred is None:
+            heapq.heappop(self._heap)
+        else:
+            preferred.cancelled = True  # Lazily dropped from the heap
+            deadline = Deadline(due=preferred.due, name=preferred.name, interval=preferred.interval)
+
+        del self._entries[deadline.name]
+        self._in_flight[deadline.name] = deadline
+        self.lag[deadline.name] = self.clock() - deadline.due
+
+        return deadline.name
+
+    def retry(self, name: str, delay: float) -> None:
+        """Put an in-flight jig back on the queue without pulsing it, e.g.
+        while it's held back. Its cadence resumes from when it's pulsed.
+
+        Args:
+            name (str): Jig name, as returned by `pop_due`.
+            delay (float): Seconds until it's due again.
+        """
+
+        deadline = self._in_flight.pop(name, None)
+
+        if deadline is not None:
+            self.add(name=name, interval=deadline.interval, due=self.clock() + delay)
+
+    def reschedule(self, name: str) -> int:
+        """Put an in-flight jig back on the queue at its next slot.
+
+        Args:
+            name (str): Jig name, as returned by `pop_due`.
+
+        Returns:
+            int: Number of deadlines missed (skipped) since the last pulse.
+        """
+
+        deadline = self._in_flight.pop(name, None)
+
+        if deadline is None:  # Removed while in flight
+            return 0
+
+        now = self.clock()
+        due = deadline.due + deadline.interval
+        skipped = 0
+
+        if due <= now:
+            skipped = floor((now - due) / deadline.interval) + 1
+            self.missed[name] += skipped
+            due += skipped * deadline.interval
+            logging.warning(
+                f'{name} missed {skipped} deadline(s), '
+                f'{self.missed[name]} in total.'
+            )
+
+        self.add(name=name, interval=deadline.interval, due=due)
+
+        return skipped
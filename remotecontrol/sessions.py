@@ -0,0 +1,124 @@
+"""Shared, connection-pooled HTTP sessions for the instruments.
+
+Every pulse makes several round trips (mux, pulser, scope). Reusing one
+keep-alive session per instrument saves a TCP handshake on each of them, and
+explicit timeouts make sure a stalled instrument raises instead of hanging the
+controller thread forever.
+"""
+
+from dataclasses import dataclass
+import logging
+import threading
+from typing import Dict, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from remotecontrol import utils
+
+POOL_SIZE = 4
+BACKOFF_FACTOR = 0.1  # s, doubled for each retry
+
+
+@dataclass
+class Settings:
+    """Per-instrument connection settings.
+
+    Can be overridden per container in docker.json, e.g.
+    {"picoscope": {"ip": 3, "port": 5000, "read_timeout": 60}}.
+
+    Attributes:
+        connect_timeout (float): Time allowed to establish a connection [s].
+        read_timeout (float): Time allowed between bytes of the response [s].
+        retries (int): Retries on connection errors and 5xx responses.
+    """
+
+    connect_timeout: float = 1.0  # s
+    read_timeout: float = 10.0  # s
+    retries: int = 2
+
+    def __post_init__(self):
+        self.connect_timeout = float(self.connect_timeout)
+        self.read_timeout = float(self.read_timeout)
+        self.retries = int(self.retries)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """In the (connect, read) format requests wants."""
+
+        return self.connect_timeout, self.read_timeout
+
+    @classmethod
+    def from_container(cls, container: dict, **defaults) -> 'Settings':
+        """Settings from a docker.json entry, ignoring its ip/port keys.
+
+        Args:
+            container (dict): docker.json entry.
+            **defaults: Instrument-specific defaults, overridden by container.
+        """
+
+        return utils.dataclass_from_dict(cls, {**defaults, **container})
+
+
+_sessions: Dict[str, requests.Session] = dict()
+_lock = threading.Lock()
+
+
+def _make_session(retries: int) -> requests.Session:
+    retry = Retry(
+        total=retries,
+        backoff_factor=BACKOFF_FACTOR,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({'GET', 'POST'}),  # Repeating a serial command/capture is harmless
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+
+    return session
+
+
+def get(base_url: str, settings: Settings) -> requests.Session:
+    """One pooled session per instrument, shared by everything that talks to it.
+
+    Args:
+        base_url (str): Format http://192.168.0.1:8001.
+        settings (Settings): Used for the retry policy the first time around.
+
+    Returns:
+        requests.Session: Keep-alive session.
+    """
+
+    with _lock:
+        if base_url not in _sessions:
+            _sessions[base_url] = _make_session(retries=settings.retries)
+
+        return _sessions[base_url]
+
+
+def warm_up(base_url: str, settings: Settings) -> bool:
+    """Open a connection up front so the first pulse doesn't pay for it.
+
+    Any response counts—we only care about the TCP connection being pooled.
+
+    Returns:
+        bool: Whether the instrument answered.
+    """
+
+    try:
+        get(base_url, settings).head(base_url, timeout=settings.timeout)
+    except requests.RequestException as e:
+        logging.warning(f'Could not warm up {base_url}: {e}')
+        return False
+
+    return True
+
+
+def close() -> None:
+    with _lock:
+        for session in _sessions.values():
+            session.close()
+
+        _sessions.clear()
@@ -78,4 +78,14 @@ def make_url(ip_address: str, port: int) -> str:
 
 
 def make_ip(ip_ending) -> str:
-    return f'{NETWORK_IP}.{ip_ending}'
\ No newline at end of file
+    return f'{NETWORK_IP}.{ip_ending}'
+
+
+def container_host(container: dict) -> str:
+    """Host of a docker.json entry.
+
+    An explicit "host" (e.g. "127.0.0.1" for simulated instruments) wins over
+    the lab network's "ip" ending.
+    """
+
+    return container.get('host') or make_ip(container['ip'])
\ No newline at end of file
@@ -1,40 +1,49 @@
+"""RemoteControl server.
+
+Importing this module has no side effects: config, jigs and instruments are
+loaded on first use, and the controllers only start in `main`.
+"""
+
+import dataclasses
 import json
-import threading
-from time import sleep
+import math
+from typing import List
 
 import flask
 from werkzeug.exceptions import BadRequest
 
-from remotecontrol import controller, logger, utils
-
+from remotecontrol import catalog, config, controller, database, events, features, jigs, logger, utils
+from remotecontrol.metrics import metrics
 
-with open('docker.json', 'r') as json_file:
-    containers = json.load(json_file)
 
+def configure_routes(app):
 
-HOST = utils.make_ip(containers['remotecontrol']['ip'])
-PORT = containers['remotecontrol']['port']
+    @app.route('/')
+    def hello_world():
+        return 'RemoteControl is up.'
 
-logger.configure()
-app: flask.Flask = flask.Flask(__name__)
 
-controller_: controller.Controller = controller.Controller()
-thread = threading.Thread(target=controller.Controller.loop, args=(controller_))
-thread.start()
+    @app.route('/last_updated', methods=['POST'])
+    def last_updated():
+        jig_name = flask.request.json
 
+        return json.dumps(jigs.jigs()[jig_name].last_updated)
 
-def configure_routes(app):
 
-    @app.route('/')
-    def hello_world():
-        return 'RemoteControl is up.'
+    @app.route('/latest', methods=['GET'])
+    def latest():
+        """Newest waveform(s) of a jig, straight from memory.
 
+        Query args: jig, n (number of waveforms, default 1) and downsample
+        (keep every Nth sample, default 1).
+        """
 
-    # @app.route('/last_updated', methods=['POST'])
-    # def last_updated():
-    #     jig_name = flask.request.json()
+        args = flask.request.args
+        jig = jigs.jigs()[args['jig']]
+        times, amps = jig.recent.latest(n=args.get('n', default=1, type=int))
+        downsample = args.get('downsample', default=1, type=int)
 
-    #     return controller_.jigs[jig_name].last_updated
+        return flask.jsonify(time=times.tolist(), amps=amps[..., ::downsample].tolist())
 
 
     # @app.route('/pulse', methods=['POST'])
@@ -46,17 +55,20 @@ def configure_routes(app):
 
     @app.route('/start', methods=['POST'])
     def start():
-        payload = flask.request.json()
+        payload = flask.request.json
         jig = payload['jig']
 
-        return controller_.jigs[jig].start(payload)
+        try:
+            return json.dumps(jigs.jigs()[jig].start(payload))
+        except ValueError as e:
+            return bad_request(e)
 
 
     @app.route('/status', methods=['POST'])
     def status():
-        jig_name = flask.request.json()
+        jig_name = flask.request.json
 
-        return controller_.jigs[jig_name].status
+        return json.dumps(jigs.jigs()[jig_name].status)
 
 
     # @app.route('/available_jigs', methods=['POST'])
@@ -68,20 +80,243 @@ def configure_routes(app):
 
     @app.route('/stop', methods=['POST'])
     def stop():
-        jig_name = flask.request.json()
-        controller_.jigs[jig_name].stop()
-        sleep(2)
+        jig_name = flask.request.json
+        jigs.jigs()[jig_name].stop()
 
         return status()
 
 
+    def unknown_jigs(names) -> List[str]:
+        return [name for name in names if name not in jigs.jigs()]
+
+
+    def not_found(names: List[str]) -> flask.Response:
+        return flask.Response(json.dumps({'unknown_jigs': names}), status=404, mimetype='application/json')
+
+
+    def bad_request(e: Exception) -> flask.Response:
+        return flask.Response(json.dumps({'error': str(e)}), status=400, mimetype='application/json')
+
+
+    def snapshot_response(names=None) -> flask.Response:
+        """All (or the named) jigs' states, with an ETag so unchanged polls get
+        a 304."""
+
+        if names is not None and len(unknown_jigs(names)) > 0:
+            return not_found(unknown_jigs(names))
+
+        states = jigs.snapshot(jigs.jigs(), names)
+        response = flask.Response(json.dumps(states, sort_keys=True), mimetype='application/json')
+        response.add_etag()
+
+        return response.make_conditional(flask.request)
+
+
+    @app.route('/jigs', methods=['GET'])
+    def jigs_():
+        """Status of many jigs in one consistent snapshot.
+
+        Query args: jig (repeatable), defaults to all. Honours If-None-Match.
+        E.g. /jigs?jig=pikachu&jig=zapdos
+        """
+
+        return snapshot_response(flask.request.args.getlist('jig') or None)
+
+
+    @app.route('/jigs/start', methods=['POST'])
+    def start_jigs():
+        """Start many jigs at once.
+
+        Body: {"shared": {"interval": 10, "pulser": {...}, "picoscope": {...}, ...},
+               "jigs": {"pikachu": {"exp_id": "..."}, "zapdos": {"exp_id": "..."}}}
+        Per-jig parameters override shared ones. Returns the snapshot of the
+        started jigs.
+        """
+
+        body = flask.request.json
+        payloads = body['jigs']
+
+        if len(unknown_jigs(payloads)) > 0:
+            return not_found(unknown_jigs(payloads))
+
+        try:
+            jigs.start_many(jigs.jigs(), payloads, shared=body.get('shared'))
+        except ValueError as e:
+            return bad_request(e)
+
+        return snapshot_response(list(payloads))
+
+
+    @app.route('/jigs/stop', methods=['POST'])
+    def stop_jigs():
+        """Stop many jigs at once.
+
+        Body: {"jigs": ["pikachu", "zapdos"]}, or {} for every running jig.
+        Returns the snapshot of the stopped jigs.
+        """
+
+        jig_table = jigs.jigs()
+        names = (flask.request.json or dict()).get('jigs')
+
+        if names is None:
+            names = [name for name, jig in jig_table.items() if jig.status == jigs.Status.running.value]
+
+        if len(unknown_jigs(names)) > 0:
+            return not_found(unknown_jigs(names))
+
+        jigs.stop_many(jig_table, names)
+
+        return snapshot_response(names)
+
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_():
+        """Per-stage timings, counters and queue depths for Prometheus."""
+
+        return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+
+    @app.route('/experiments', methods=['GET'])
+    def experiments():
+        """All experiments in the catalog, or only running ones with ?live=1."""
+
+        if flask.request.args.get('live', default=0, type=int):
+            records = catalog.default().live
+        else:
+            records = list(catalog.default().records.values())
+
+        return flask.jsonify(
+            last_update=catalog.default().last_update,
+            experiments=[dataclasses.asdict(record) for record in records]
+        )
+
+
+    @app.route('/waveforms', methods=['GET'])
+    def waveforms():
+        """Streams stored waveforms as newline-delimited json.
+
+        Query args: jig (or exp_id), start, end (unix timestamps) and every
+        (decimation). E.g. /waveforms?jig=pikachu&start=1690000000&every=10
+        """
+
+        args = flask.request.args
+        exp_id = args.get('exp_id') or jigs.jigs()[args['jig']].parameters['exp_id']
+
+        if not database.exists(exp_id):
+            return '', 404
+
+        every = args.get('every', default=1, type=int)
+
+        try:
+            database.check_every(every)  # Up front, read() only checks once streaming
+        except ValueError as e:
+            return bad_request(e)
+
+        chunks = database.read(
+            db_filename=exp_id,
+            start=args.get('start', type=float),
+            end=args.get('end', type=float),
+            every=every
+        )
+
+        def generate():
+            for times, amps in chunks:
+                for time_, amps_ in zip(times, amps):
+                    yield json.dumps({'time': time_, 'amps': amps_.tolist()}) + '\n'
+
+        return flask.Response(generate(), mimetype='application/x-ndjson')
+
+
+    @app.route('/features', methods=['GET'])
+    def features_():
+        """Feature trends of an experiment as json columns, for plots and
+        alarms that don't need whole waveforms.
+
+        Query args: jig (or exp_id), name (repeatable, defaults to all), start,
+        end (unix timestamps) and every (decimation).
+        E.g. /features?jig=pikachu&name=tof&name=peak&every=10
+        """
+
+        args = flask.request.args
+        exp_id = args.get('exp_id') or jigs.jigs()[args['jig']].parameters['exp_id']
+
+        if not database.exists(exp_id):
+            return '', 404
+
+        try:
+            columns = database.read_features(
+                db_filename=exp_id,
+                names=args.getlist('name') or features.NAMES,
+                start=args.get('start', type=float),
+                end=args.get('end', type=float),
+                every=args.get('every', default=1, type=int)
+            )
+        except ValueError as e:
+            return bad_request(e)
+
+        # NaN isn't json, None is
+        return flask.jsonify({
+            name: [None if math.isnan(value) else value for value in column.tolist()]
+            for name, column in columns.items()
+        })
+
+
+    @app.route('/events', methods=['GET'])
+    def events_():
+        """Server-Sent Events: status transitions, pulses and errors as they
+        happen, instead of polling /status.
+
+        Query args: jig (repeatable) and type (repeatable, status, pulse or
+        error) to filter. Reconnecting clients resume from Last-Event-ID.
+        E.g. /events?jig=pikachu&type=status&type=error
+        """
+
+        jig_names = set(flask.request.args.getlist('jig'))
+        types = set(flask.request.args.getlist('type'))
+        last_id = flask.request.headers.get('Last-Event-ID', type=int)
+
+        def generate():
+            yield 'retry: 1000\n\n'
+
+            for event in events.subscribe(last_id=last_id):
+                if event is None:
+                    yield ': keepalive\n\n'  # Comment, ignored by clients but keeps proxies from timing out
+                elif (len(jig_names) == 0 or event.data['jig'] in jig_names) and (len(types) == 0 or event.type in types):
+                    yield event.format()
+
+        return flask.Response(
+            generate(),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+
     @app.errorhandler(BadRequest)
     def handle_bad_request(e):
         return '', 404
 
 
-configure_routes(app)
+def create_app() -> flask.Flask:
+    """Application factory. Cheap: nothing is read or connected until a
+    request needs it."""
+
+    app = flask.Flask(__name__)
+    configure_routes(app)
+
+    return app
+
+
+def main() -> None:
+    """Load config, start one controller per rig, resume experiments from the
+    journal and serve."""
+
+    logger.configure()
+    container = config.containers()['remotecontrol']
+    controller.start_all()  # One thread per rig
+    jigs.resume(jigs.jigs())
+    catalog.default().watch()
+    create_app().run(host=utils.container_host(container), port=container['port'], debug=False)
 
 
 if __name__ == '__main__':
-    app.run(port=PORT, host=HOST, debug=False)
+    main()
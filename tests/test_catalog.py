@@ -0,0 +1,94 @@
+import os
+
+import pytest
+
+from remotecontrol import catalog, config
+
+EXP_ID = 'test'
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'catalog.json')
+
+
+@pytest.fixture
+def instance(path):
+    return catalog.Catalog(path=path)
+
+
+def test_start_is_live(instance):
+    instance.start(EXP_ID, jig='pikachu')
+
+    assert instance.is_live(EXP_ID)
+    assert [record.exp_id for record in instance.live] == [EXP_ID]
+
+
+def test_stop(instance):
+    instance.start(EXP_ID, jig='pikachu')
+    instance.stop(EXP_ID)
+
+    assert not instance.is_live(EXP_ID)
+    assert instance.records[EXP_ID].ended is not None
+
+
+def test_start_again_continues_record(instance):
+    instance.start(EXP_ID, jig='pikachu')
+    instance.record_write(EXP_ID, rows=2, n_bytes=10)
+    instance.stop(EXP_ID)
+    instance.start(EXP_ID, jig='pikachu')
+
+    assert instance.is_live(EXP_ID)
+    assert instance.records[EXP_ID].rows == 2
+
+
+def test_record_write(instance):
+    instance.start(EXP_ID, jig='pikachu')
+    instance.record_write(EXP_ID, rows=2, n_bytes=10, timestamp=5.0)
+    instance.record_write(EXP_ID, rows=3, n_bytes=20, timestamp=6.0)
+    record = instance.records[EXP_ID]
+
+    assert (record.rows, record.bytes_written, record.last_write) == (5, 30, 6.0)
+    assert instance.last_update == 6.0
+
+
+def test_record_drop_is_persisted(instance, path):
+    instance.start(EXP_ID, jig='pikachu')
+    instance.record_drop(EXP_ID, rows=3)
+
+    assert catalog.Catalog(path=path).records[EXP_ID].rows_dropped == 3
+
+
+def test_persisted(instance, path):
+    instance.start(EXP_ID, jig='pikachu')
+    instance.stop(EXP_ID)
+
+    reloaded = catalog.Catalog(path=path)
+
+    assert reloaded.records == instance.records
+
+
+def test_touch_external(instance, tmp_path):
+    file_path = tmp_path / f'external{catalog.SUFFIX}'
+    file_path.write_bytes(b'0' * 8)
+    os.utime(file_path)
+
+    instance._touch(str(file_path))
+
+    assert instance.is_live('external')
+    assert instance.records['external'].bytes_written == 8
+
+
+def test_default_adopts_legacy_catalog(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config.containers.cache_clear()
+    catalog.default.cache_clear()
+    legacy = catalog.Catalog(path=catalog.LEGACY_PATH)
+    legacy.start(EXP_ID, jig='pikachu')
+
+    moved = catalog.default()
+    catalog.default.cache_clear()
+
+    assert moved.path == os.path.join(config.STATE_DIR, catalog.FILENAME)
+    assert moved.is_live(EXP_ID)
+    assert not os.path.exists(catalog.LEGACY_PATH)
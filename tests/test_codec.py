@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from remotecontrol import codec
+
+N_SAMPLES = 1000
+N_ROWS = 10
+
+
+@pytest.fixture
+def waveforms():
+    rng = np.random.default_rng(0)
+    base = np.sin(np.linspace(0, 20, N_SAMPLES))
+    drift = rng.normal(scale=1e-3, size=(N_ROWS, N_SAMPLES))
+
+    return (base + drift).astype(np.float32)
+
+
+def roundtrip(spec: codec.Spec, waveforms: np.ndarray) -> np.ndarray:
+    encoder = codec.Encoder(spec)
+    blobs, headers = zip(*[encoder.encode(waveform) for waveform in waveforms])
+
+    return codec.decode(blobs, headers)
+
+
+@pytest.mark.parametrize('compression', codec.COMPRESSIONS)
+@pytest.mark.parametrize('delta', [False, True])
+def test_float32_is_lossless(waveforms, delta, compression):
+    spec = codec.Spec(dtype='float32', delta=delta, compression=compression)
+
+    assert np.array_equal(roundtrip(spec, waveforms), waveforms)
+
+
+@pytest.mark.parametrize('delta', [False, True])
+def test_int16_within_quantization_error(waveforms, delta):
+    spec = codec.Spec(dtype='int16', delta=delta, compression='zlib')
+    step = np.ptp(waveforms) * codec.HEADROOM / (2 * codec.INT16_MAX)
+
+    assert np.abs(roundtrip(spec, waveforms) - waveforms).max() <= step
+
+
+def test_int16_new_keyframe_when_out_of_range(waveforms):
+    encoder = codec.Encoder(codec.Spec(dtype='int16', delta=True))
+    encoder.encode(waveforms[0])
+    _, header = encoder.encode(waveforms[1] * 10)
+
+    assert codec.parse_header(header)['delta'] is False
+
+
+def test_delta_compresses_better(waveforms):
+    plain = codec.Encoder(codec.Spec(dtype='int16', compression='zlib'))
+    delta = codec.Encoder(codec.Spec(dtype='int16', delta=True, compression='zlib'))
+
+    plain_size = sum(len(plain.encode(waveform)[0]) for waveform in waveforms)
+    delta_size = sum(len(delta.encode(waveform)[0]) for waveform in waveforms)
+
+    assert delta_size < plain_size
+
+
+def test_keyframe_interval(waveforms):
+    spec = codec.Spec(dtype='float32', delta=True, keyframe_interval=3)
+    encoder = codec.Encoder(spec)
+    headers = [codec.parse_header(encoder.encode(waveform)[1]) for waveform in waveforms]
+
+    assert [header['n'] for header in headers][:5] == [0, 1, 2, 3, 0]
+
+
+def test_decode_mid_chain_raises(waveforms):
+    encoder = codec.Encoder(codec.Spec(dtype='float32', delta=True))
+    rows = [encoder.encode(waveform) for waveform in waveforms]
+
+    with pytest.raises(ValueError):
+        codec.decode([rows[1][0]], [rows[1][1]])
+
+
+def test_legacy_rows():
+    waveform = np.array([0.1, 0.2], dtype=np.float16)
+
+    decoded = codec.decode([waveform.tobytes()], [None])
+
+    assert np.array_equal(decoded[0], waveform.astype(np.float32))
+
+
+def test_unknown_dtype():
+    with pytest.raises(ValueError):
+        codec.Spec(dtype='float64')
+
+
+def test_decoder_carries_chain_across_chunks(waveforms):
+    encoder = codec.Encoder(codec.Spec(dtype='float32', delta=True))
+    blobs, headers = zip(*[encoder.encode(waveform) for waveform in waveforms])
+    decoder = codec.Decoder()
+
+    first = decoder.decode(blobs[:4], headers[:4])
+    second = decoder.decode(blobs[4:], headers[4:])
+
+    assert np.array_equal(np.concatenate([first, second]), waveforms)
+
+
+def test_gap_in_chain_is_broken_until_keyframe(waveforms):
+    encoder = codec.Encoder(codec.Spec(dtype='float32', delta=True, keyframe_interval=4))
+    rows = [encoder.encode(waveform) for waveform in waveforms[:8]]
+    del rows[1]  # Never stored
+    decoder = codec.Decoder()
+
+    decoded = decoder.decode(*zip(*rows))
+
+    assert decoder.broken.tolist() == [False, True, True, True, False, False, False]
+    assert np.isnan(decoded[1:4]).all()
+    assert np.array_equal(decoded[4:], waveforms[5:8])
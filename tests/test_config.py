@@ -0,0 +1,55 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from remotecontrol import config
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_import_without_docker_json(tmp_path):
+    """Importing must not read config, touch instruments or start threads."""
+
+    result = subprocess.run(
+        [sys.executable, '-c', 'import server, threading; print(threading.active_count())'],
+        cwd=tmp_path,
+        env={**os.environ, 'PYTHONPATH': ROOT},
+        capture_output=True,
+        text=True
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '1'
+    assert os.listdir(tmp_path) == []
+
+
+def test_containers_read_once(tmp_path):
+    path = tmp_path / 'docker.json'
+    path.write_text(json.dumps({'mux': {'host': '127.0.0.1', 'port': 9001}}))
+
+    first = config.containers(str(path))
+    path.unlink()
+
+    assert config.containers(str(path)) is first
+
+
+@pytest.fixture
+def fresh(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config.containers.cache_clear()
+    yield tmp_path
+
+    config.containers.cache_clear()
+
+
+def test_state_path_defaults_outside_acoustics(fresh):
+    assert config.state_path('journal.jsonl') == os.path.join(config.STATE_DIR, 'journal.jsonl')
+
+
+def test_state_path_from_docker_json(fresh):
+    (fresh / config.PATH).write_text(json.dumps({'remotecontrol': {'port': 5000, 'state_dir': '/var/lib/rc'}}))
+
+    assert config.state_path('journal.jsonl') == '/var/lib/rc/journal.jsonl'
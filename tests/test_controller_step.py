@@ -0,0 +1,174 @@
+import json
+import threading
+from time import perf_counter
+
+import pytest
+from requests import Response
+
+from remotecontrol import jigs
+from remotecontrol.catalog import Catalog
+from remotecontrol.controller import RETRY_S, Controller
+from remotecontrol.journal import Journal
+from remotecontrol.metrics import metrics
+from remotecontrol.mux import Channel
+from remotecontrol.rig import Rig
+from remotecontrol.scheduler import Scheduler
+
+PAYLOAD = {
+    'exp_id': 'step',
+    'interval': 100,
+    'exp_duration_h': 1,
+    'pulser': {'gain_dB': 30},
+    'picoscope': {'delay': 10, 'duration': 10, 'voltage_range': 1, 'avg_num': 8},
+}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class StubInstrument:
+    def __init__(self):
+        self.invalidated = 0
+
+    def apply(self, payloads):
+        return list(payloads)
+
+    def applied(self, payloads) -> bool:
+        return False
+
+    def wait_until_ready(self) -> None:
+        pass
+
+    def invalidate(self) -> None:
+        self.invalidated += 1
+
+
+class StubScope:
+    def __init__(self):
+        self.captures = 0
+        self.fail = False
+
+    def capture(self, pulsing_params):
+        if self.fail:
+            raise ConnectionError('Scope unreachable')
+
+        self.captures += 1
+        response = Response()
+        response._content = json.dumps({'amps': [0.0, 1.0]}).encode()
+        response.headers['Content-Type'] = 'application/json'
+
+        return response
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def controller(tmp_path, monkeypatch, clock):
+    monkeypatch.chdir(tmp_path)
+    rig = Rig(name='test', mux=StubInstrument(), pulser=StubInstrument(), scope=StubScope())
+    registry = jigs.Registry()
+    jig = jigs.Jig(
+        name='pikachu',
+        mux=Channel(switch=1),
+        rig=rig,
+        registry=registry,
+        catalog=Catalog(path='catalog.json'),
+        journal=Journal(path='journal.jsonl')
+    )
+    controller = Controller(rig=rig, registry=registry, jig_table={'pikachu': jig})
+    controller.scheduler = Scheduler(clock=clock)
+    yield controller
+
+    controller.pipeline.stop()
+
+
+def sync(controller):
+    with controller.registry.condition:
+        controller.sync_schedule()
+
+
+def test_start_wakes_the_loop(controller):
+    done = threading.Event()
+
+    def loop():
+        while not done.is_set():
+            controller.step()
+
+    thread = threading.Thread(target=loop, daemon=True)
+    thread.start()
+    jig = controller.jigs['pikachu']
+
+    start = perf_counter()
+    jig.start(PAYLOAD)  # Waits for the controller to schedule it
+
+    assert perf_counter() - start < jigs.SYNC_TIMEOUT_S
+    assert 'pikachu' in controller.scheduler
+
+    jig.stop()  # Waits for the controller to unschedule it
+    done.set()
+
+    with controller.registry.condition:
+        controller.registry.condition.notify_all()
+
+    thread.join(timeout=1)
+    controller.pipeline.join()
+
+    assert controller.rig.scope.captures == 1
+    assert jig.database.closed  # Wrapped up by the controller
+
+
+def test_restart_reschedules(controller):
+    jig = controller.jigs['pikachu']
+    jig.start(PAYLOAD, wait=False)
+    controller.step()
+    first = jig.run
+    jig.start({**PAYLOAD, 'exp_id': 'step2', 'interval': 1}, wait=False)
+    controller.step()
+    controller.pipeline.join()
+
+    assert controller.scheduler.time_until_next() == pytest.approx(1)
+    assert first.database.closed and not jig.database.closed
+
+    jig.stop(wait=False)
+    sync(controller)
+    controller.pipeline.join()
+
+
+def test_block_holds_back_without_capturing(controller, monkeypatch):
+    jig = controller.jigs['pikachu']
+    jig.start(PAYLOAD, wait=False)
+    monkeypatch.setattr(controller.pipeline, 'has_room', lambda priority=0: False)
+    held_back = metrics.counter('held_back_total', jig='pikachu')
+
+    controller.step()
+
+    assert controller.rig.scope.captures == 0
+    assert metrics.counter('held_back_total', jig='pikachu') == held_back + 1
+    assert controller.scheduler.time_until_next() == pytest.approx(RETRY_S)
+
+    jig.stop(wait=False)
+    sync(controller)
+
+
+def test_failed_acquisition_invalidates_instruments(controller):
+    jig = controller.jigs['pikachu']
+    jig.start(PAYLOAD, wait=False)
+    controller.rig.scope.fail = True
+    failures = metrics.counter('failures_total', stage='acquire', jig='pikachu')
+
+    controller.step()
+
+    assert metrics.counter('failures_total', stage='acquire', jig='pikachu') == failures + 1
+    assert controller.rig.mux.invalidated == controller.rig.pulser.invalidated == 1
+    assert controller.scheduler.time_until_next() == pytest.approx(PAYLOAD['interval'])
+
+    jig.stop(wait=False)
+    sync(controller)
@@ -1,16 +1,18 @@
 import os
 import sqlite3
+import threading
 
+import numpy as np
 import pytest
 
-from controller import database
+from remotecontrol import codec, database
+from remotecontrol.catalog import Catalog
+from remotecontrol.metrics import metrics
 
 DB_FILENAME = 'test'
 FOLDER = 'acoustics'
-dummy_query = 'INSERT INTO acoustics (time, amps) VALUES (0, "[0.1, 0.2]");'
 dummy_waveform = [0.1, 0.2]
 dummy_data = {'time': 0.0, 'amps': dummy_waveform}
-dummy_payload = {'amps': dummy_waveform}
 
 
 def find_table(filename) -> str:
@@ -26,15 +28,27 @@ def find_table(filename) -> str:
     return table[0][0]
 
 
+def count_rows(filename) -> int:
+    connection = sqlite3.connect(f'{FOLDER}/{filename}.sqlite3')
+    count = connection.execute('SELECT COUNT(*) FROM acoustics WHERE time IS NOT NULL').fetchone()[0]
+    connection.close()
+
+    return count
+
+
 @pytest.fixture
 def teardown():
     yield 
 
-    os.remove(f'{FOLDER}/{DB_FILENAME}.sqlite3')
+    for suffix in ('.sqlite3', '.sqlite3-wal', '.sqlite3-shm', database.WAVEFORMS_SUFFIX):
+        path = f'{FOLDER}/{DB_FILENAME}{suffix}'
+
+        if os.path.isfile(path):
+            os.remove(path)
 
 
 def test_create_table(teardown):
-    database.Database(DB_FILENAME)
+    database.Database(DB_FILENAME).close()
 
     table = find_table(DB_FILENAME)
 
@@ -43,23 +57,274 @@ def test_create_table(teardown):
 
 @pytest.fixture
 def instance(teardown):
-    instance = database.Database(DB_FILENAME)
+    instance = database.Database(DB_FILENAME, batch_size=4, commit_interval_s=60)
+    yield instance
+
+    instance.close()
+
+
+def test_wal_mode(instance):
+    connection = sqlite3.connect(instance.path)
+    journal_mode = connection.execute('PRAGMA journal_mode').fetchone()[0]
+    connection.close()
+
+    assert journal_mode == 'wal'
+
+
+def test_parse_parameters(instance):
+    parsed = instance._parse_parameters([0.0, np.array(dummy_waveform)])
+
+    assert parsed[0] == 0.0
+    assert np.frombuffer(parsed[1], dtype=np.float16).shape == (2,)
+    assert isinstance(parsed[2], str)
+
+
+def test_write_is_batched(instance):
+    for i in range(3):
+        instance.write({'time': float(i), 'amps': dummy_waveform})
+
+    assert count_rows(DB_FILENAME) == 0
+
+    instance.write({'time': 3.0, 'amps': dummy_waveform})
+    instance.flush()
+
+    assert count_rows(DB_FILENAME) == 4
+
+
+def test_failed_batch_drops_only_failing_rows(teardown, tmp_path):
+    catalog = Catalog(path=str(tmp_path / 'catalog.json'))
+    instance = database.Database(DB_FILENAME, catalog=catalog, batch_size=20)
+    dropped = metrics.counter('dropped_total', stage='commit', database=DB_FILENAME)
+
+    for i in range(20):
+        instance.write({'time': float(min(i, 18)), 'amps': dummy_waveform})  # Last time repeats
+
+    instance.close()
+
+    assert count_rows(DB_FILENAME) == 19
+    assert (catalog.records[DB_FILENAME].rows, catalog.records[DB_FILENAME].rows_dropped) == (19, 1)
+    assert metrics.counter('dropped_total', stage='commit', database=DB_FILENAME) == dropped + 1
+
+
+def test_flush(instance):
+    instance.write(dummy_data)
+    instance.flush()
+
+    assert count_rows(DB_FILENAME) == 1
+    assert instance.queue_depth == 0
+
+
+def test_close_flushes(instance):
+    instance.write(dummy_data)
+    instance.close()
+
+    assert count_rows(DB_FILENAME) == 1
+
+
+def test_read_features(instance):
+    instance.write({'time': 0.0, 'amps': dummy_waveform, 'peak': 0.2, 'tof': 1.5})
+    instance.write({'time': 1.0, 'amps': dummy_waveform})
+    instance.flush()
+
+    columns = database.read_features(DB_FILENAME, names=('peak', 'tof'))
+
+    assert np.array_equal(columns['time'], [0.0, 1.0])
+    assert columns['peak'][0] == pytest.approx(0.2) and np.isnan(columns['peak'][1])
+    assert columns['tof'][0] == 1.5
+
+
+def test_read_features_decimated(instance):
+    for i in range(10):
+        instance.write({'time': float(i), 'amps': dummy_waveform, 'peak': float(i)})
+
+    instance.flush()
+
+    columns = database.read_features(DB_FILENAME, names=('peak',), start=1, end=8, every=3)
+
+    assert np.array_equal(columns['time'], [1, 4, 7])
+    assert np.array_equal(columns['peak'], [1, 4, 7])
+
+
+@pytest.mark.parametrize('every', [0, -1])
+def test_invalid_decimation(written, every):
+    with pytest.raises(ValueError):
+        next(database.read(DB_FILENAME, every=every))
+
+    with pytest.raises(ValueError):
+        database.read_features(DB_FILENAME, every=every)
+
+
+def test_write_after_close_is_dropped(instance):
+    instance.close()
+    instance.write(dummy_data)
+
+    assert count_rows(DB_FILENAME) == 0
+
+
+@pytest.fixture
+def written(instance):
+    rng = np.random.default_rng(0)
+    waveforms = rng.normal(size=(10, 8)).astype(np.float16)
+
+    for i, waveform in enumerate(waveforms):
+        instance.write({'time': float(i), 'amps': waveform})
+
+    instance.write_metadata({'exp_id': DB_FILENAME})
+    instance.flush()
+
+    return waveforms
+
+
+def test_read(written):
+    chunks = list(database.read(DB_FILENAME, chunk_size=3))
+    times = np.concatenate([chunk[0] for chunk in chunks])
+    waveforms = np.concatenate([chunk[1] for chunk in chunks])
+
+    assert len(chunks) == 4
+    assert np.array_equal(times, np.arange(10))
+    assert np.array_equal(waveforms, written.astype(np.float32))
+
+
+def test_read_range_and_decimation(written):
+    chunks = list(database.read(DB_FILENAME, start=2, end=8, every=3, chunk_size=4))
+    times = np.concatenate([chunk[0] for chunk in chunks])
+
+    assert np.array_equal(times, [2, 5, 8])
+
+
+def test_read_metadata(written):
+    assert database.read_metadata(DB_FILENAME) == [{'exp_id': DB_FILENAME}]
+
+
+@pytest.fixture
+def delta_instance(teardown):
+    spec = codec.Spec(dtype='float32', delta=True, keyframe_interval=4)
+    instance = database.Database(DB_FILENAME, codec_spec=spec)
+    yield instance
+
+    instance.close()
+
+
+def test_read_delta_mid_chain(delta_instance):
+    waveforms = np.cumsum(np.ones((10, 8), dtype=np.float32), axis=0)
+
+    for i, waveform in enumerate(waveforms):
+        delta_instance.write({'time': float(i), 'amps': waveform})
+
+    delta_instance.flush()
+    chunks = list(database.read(DB_FILENAME, start=3, every=2, chunk_size=2))
+
+    assert np.array_equal(np.concatenate([chunk[0] for chunk in chunks]), [3, 5, 7, 9])
+    assert np.array_equal(np.concatenate([chunk[1] for chunk in chunks]), waveforms[3::2])
+
+
+def test_dropped_row_restarts_delta_chain(teardown):
+    instance = database.Database(DB_FILENAME, codec_spec=codec.Spec(dtype='float32', delta=True))
+    waveforms = np.cumsum(np.ones((8, 8), dtype=np.float32), axis=0)
+    times = [0, 1, 2, 2, 4, 5, 6, 7]  # The second 2 clashes and is dropped
+
+    for time_, waveform in zip(times[:6], waveforms):
+        instance.write({'time': float(time_), 'amps': waveform})
+
+    instance.flush()
+
+    for time_, waveform in zip(times[6:], waveforms[6:]):
+        instance.write({'time': float(time_), 'amps': waveform})  # Keyframe after the drop
+
+    instance.close()
+    chunks = list(database.read(DB_FILENAME))
+
+    assert np.array_equal(np.concatenate([chunk[0] for chunk in chunks]), [0, 1, 2, 6, 7])
+    assert np.array_equal(np.concatenate([chunk[1] for chunk in chunks]), waveforms[[0, 1, 2, 6, 7]])
+    assert np.array_equal(next(database.read(DB_FILENAME, start=7))[1], waveforms[7:])
+
+
+def test_memmap_load_and_resume(teardown):
+    instance = database.MemmapDatabase(DB_FILENAME, codec_spec=codec.Spec(dtype='float32'))
+
+    for i in range(3):
+        instance.write({'time': float(i), 'amps': np.full(4, i), 'peak': float(i)})
+
+    instance.close()
+    instance = database.MemmapDatabase(DB_FILENAME, codec_spec=codec.Spec(dtype='float32'))
+    instance.write({'time': 3.0, 'amps': np.full(4, 3)})
+    instance.close()
+
+    times, waveforms = database.load(DB_FILENAME)
+    chunks = list(database.read(DB_FILENAME, start=1, every=2))
+
+    assert isinstance(waveforms, np.memmap)
+    assert np.array_equal(times, [0, 1, 2, 3])
+    assert np.array_equal(waveforms[:, 0], [0, 1, 2, 3])
+    assert os.path.getsize(f'{FOLDER}/{DB_FILENAME}{database.WAVEFORMS_SUFFIX}') == 4 * 4 * 4
+    assert np.array_equal(chunks[0][0], [1, 3])
+    assert database.read_features(DB_FILENAME, names=('peak', ))['peak'][2] == 2.0
+
+
+def test_memmap_waits_for_earlier_instance(teardown, monkeypatch):
+    spec = codec.Spec(dtype='float32')
+    first = database.MemmapDatabase(DB_FILENAME, codec_spec=spec)
+    first.write({'time': 0.0, 'amps': np.zeros(4)})
+    first.flush()
+    opened = list()
+    thread = threading.Thread(target=lambda: opened.append(database.MemmapDatabase(DB_FILENAME, codec_spec=spec)))
+    thread.start()
+    thread.join(timeout=0.1)
+    first.write({'time': 1.0, 'amps': np.ones(4)})  # Not yet indexed when the second one would resume
+
+    assert opened == []  # Waiting for the first one
+
+    first.close()
+    thread.join(timeout=5)
+    second = opened[0]
+    second.write({'time': 2.0, 'amps': np.full(4, 2)})
+    second.close()
+    monkeypatch.setattr(database, 'OPEN_TIMEOUT_S', 0.01)
+    third = database.MemmapDatabase(DB_FILENAME, codec_spec=spec)
+
+    with pytest.raises(ValueError):
+        database.MemmapDatabase(DB_FILENAME, codec_spec=spec)
+
+    third.close()
+    times, waveforms = database.load(DB_FILENAME)
+
+    assert np.array_equal(times, [0, 1, 2])
+    assert np.array_equal(waveforms[:, 0], [0, 1, 2])
+
+
+def test_memmap_needs_fixed_width(teardown):
+    with pytest.raises(ValueError):
+        database.MemmapDatabase(DB_FILENAME, codec_spec=codec.Spec(dtype='int16', delta=True))
+
+
+def test_memmap_write_after_close_touches_no_file(teardown, tmp_path):
+    instance = database.MemmapDatabase(DB_FILENAME, codec_spec=codec.Spec(dtype='float32'))
+    instance.write({'time': 0.0, 'amps': np.zeros(4)})
+    instance.close()
 
-    return instance
+    with open(tmp_path / 'unrelated', 'wb') as unrelated:  # Likely reuses the released fd
+        assert instance.write({'time': 1.0, 'amps': np.ones(4)}) == 0
 
+    with pytest.raises(ValueError):
+        instance._encode(np.ones(4))
 
-def test_parse_query(instance):
-    query = instance.parse_query(dummy_data)
+    assert os.path.getsize(tmp_path / 'unrelated') == 0
+    assert os.path.getsize(f'{FOLDER}/{DB_FILENAME}{database.WAVEFORMS_SUFFIX}') == 4 * 4
 
-    assert isinstance(query, str)
 
+def test_connect_error_is_raised(teardown):
+    with pytest.raises(sqlite3.Error):
+        database.Database('missing/folder')
 
-def test_write(instance):
-    row_id = instance.write(query=dummy_query)
 
-    assert row_id == 1
+def test_dead_writer_blocks_nobody(teardown):
+    instance = database.Database(DB_FILENAME, queue_size=1)
+    instance._put(database.Job.metadata, (0.0, object()))  # Can't be bound, kills the writer
+    instance.thread.join(timeout=1)
 
-def test_save(instance):
-    row_id = database.save(dummy_payload, instance)
+    instance.write(dummy_data)
+    instance.write(dummy_data)
+    instance.flush()
+    instance.close()
 
-    assert row_id == 1
+    assert instance.closed and instance.error is not None
@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from remotecontrol.events import Bus
+
+
+@pytest.fixture
+def instance():
+    return Bus(capacity=4)
+
+
+def test_since(instance):
+    instance.publish('status', jig='pikachu', status='running')
+    instance.publish('pulse', jig='pikachu', peak=1.0)
+
+    events = instance.since(last_id=1)
+
+    assert [event.type for event in events] == ['pulse']
+    assert events[0].data == {'jig': 'pikachu', 'peak': 1.0}
+
+
+def test_since_times_out(instance):
+    assert instance.since(last_id=0, timeout=0.01) == []
+
+
+def test_capacity(instance):
+    for i in range(6):
+        instance.publish('pulse', jig='pikachu', i=i)
+
+    assert [event.id for event in instance.since(last_id=0)] == [3, 4, 5, 6]
+
+
+def test_subscribe_wakes_on_publish(instance):
+    stream = instance.subscribe(keepalive_s=5)
+    threading.Timer(0.05, instance.publish, args=('error', ), kwargs={'jig': 'zapdos'}).start()
+
+    event = next(stream)
+
+    assert event.type == 'error' and event.data['jig'] == 'zapdos'
+
+
+def test_subscribe_keepalive_and_resume(instance):
+    instance.publish('status', jig='pikachu', status='running')
+
+    assert next(instance.subscribe(keepalive_s=0.01)) is None
+    assert next(instance.subscribe(last_id=0, keepalive_s=0.01)).id == 1
+    assert next(instance.subscribe(last_id=100, keepalive_s=0.01)) is None  # From before a restart
+
+
+def test_format(instance):
+    event = instance.publish('status', jig='pikachu', status='running')
+    lines = event.format().split('\n')
+
+    assert lines[:2] == ['id: 1', 'event: status']
+    assert lines[2].startswith('data: {"time": ')
+    assert event.format().endswith('\n\n')
@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from remotecontrol import features
+
+N_SAMPLES = 1000
+DURATION = 10.0  # µs, so 10 ns per sample
+
+
+@pytest.fixture
+def amps():
+    """Two waveforms: a 5 MHz tone arriving after 2 µs, and silence."""
+
+    t = np.arange(N_SAMPLES) * DURATION / N_SAMPLES
+    tone = np.where(t >= 2.0, np.sin(2 * np.pi * 5.0 * t), 0.0)
+
+    return np.stack([tone, np.zeros(N_SAMPLES)])
+
+
+def test_extract(amps):
+    values = features.extract(amps, delay=1.0, duration=DURATION)
+
+    assert set(values) == set(features.NAMES)
+    assert values['peak'] == pytest.approx([1.0, 0.0], abs=1e-3)
+    assert values['energy'][0] == pytest.approx(4.0, rel=1e-2)  # 8 µs of a unit sine
+    assert values['tof'][0] == pytest.approx(1.0 + 2.0 + 1 / (5.0 * 12), abs=0.02)  # Reaches half peak 1/12 period in
+    assert values['centroid'] == pytest.approx([5.0, 0.0], abs=0.1)
+
+
+def test_subset_without_duration(amps):
+    values = features.extract(amps, names=('tof', ))
+
+    assert list(values) == ['tof']
+    assert values['tof'][0] == pytest.approx(200, abs=2)  # Samples
+
+
+def test_validate():
+    with pytest.raises(ValueError):
+        features.validate(['peak', 'kurtosis'])
@@ -0,0 +1,230 @@
+import dataclasses
+import json
+import threading
+
+import numpy as np
+import pytest
+from requests import Response
+
+from remotecontrol import codec, database, events, jigs
+from remotecontrol.catalog import Catalog
+from remotecontrol.journal import Journal
+from remotecontrol.mux import Channel
+from remotecontrol.rig import Rig
+
+SHARED = {
+    'interval': 1,
+    'exp_duration_h': 1,
+    'pulser': {'gain_dB': 30},
+    'picoscope': {'delay': 10, 'duration': 10, 'voltage_range': 1, 'avg_num': 8},
+}
+
+
+@pytest.fixture
+def jig_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    rig = Rig(name='test', mux=None, pulser=None, scope=None)
+    registry = jigs.Registry()
+    catalog = Catalog(path='catalog.json')
+    journal = Journal(path='journal.jsonl')
+
+    return {
+        name: jigs.Jig(name=name, mux=Channel(switch=i), rig=rig, registry=registry, catalog=catalog, journal=journal)
+        for i, name in enumerate(['pikachu', 'zapdos', 'raichu'])
+    }
+
+
+def test_snapshot(jig_table):
+    snapshot = jigs.snapshot(jig_table, ['zapdos'])
+
+    assert snapshot == {'zapdos': {'status': 0, 'exp_id': None, 'rig': 'test', 'last_updated': -1.0}}
+
+
+def test_start_and_stop_many(jig_table):
+    registry = jig_table['pikachu'].registry
+    synced = threading.Event()
+
+    def acknowledge():  # Stand-in controller
+        with registry.condition:
+            registry.condition.wait_for(lambda: len(registry.active) == 2)
+            registry.acknowledge(registry.version)
+
+        synced.set()
+
+    threading.Thread(target=acknowledge, daemon=True).start()
+    jigs.start_many(
+        jig_table,
+        {'pikachu': {'exp_id': 'a'}, 'zapdos': {'exp_id': 'b', 'pulser': {'gain_dB': 40}}},
+        shared=SHARED
+    )
+
+    assert synced.is_set()
+    assert 'G300' in jig_table['pikachu'].plan.pulser_commands
+    assert 'G400' in jig_table['zapdos'].plan.pulser_commands
+    assert {name: state['status'] for name, state in jigs.snapshot(jig_table).items()} == {
+        'pikachu': jigs.Status.running.value,
+        'zapdos': jigs.Status.running.value,
+        'raichu': jigs.Status.not_started.value,
+    }
+
+    jigs.stop_many(jig_table, ['pikachu', 'zapdos'])  # No controller acknowledges, so they're finished here
+
+    assert all(jig_table[name].database.closed for name in ('pikachu', 'zapdos'))
+    assert jigs.snapshot(jig_table)['zapdos']['status'] == jigs.Status.stopped.value
+
+
+def capture(time_: float, amps: list) -> jigs.Capture:
+    response = Response()
+    response._content = json.dumps({'amps': amps}).encode()
+    response.headers['Content-Type'] = 'application/json'
+
+    return jigs.Capture(time=time_, response=response)
+
+
+@pytest.mark.parametrize('burst_mode, rows', [('rows', 3), ('mean', 1)])
+def test_store_burst(jig_table, burst_mode, rows):
+    jig = jig_table['pikachu']
+    jig.plan = jigs.PulsePlan.compile({**SHARED, 'exp_id': 'burst', 'burst': 3, 'burst_mode': burst_mode}, jig.mux_)
+    jig.database = database.Database('burst', codec_spec=codec.Spec(dtype='float32'))
+    jig.store([capture(float(i), [i, 2.0 * i]) for i in range(3)])
+    jig.database.close()
+
+    times, amps = next(database.read('burst'))
+    std_times, std = database.read_std('burst')
+
+    assert len(times) == rows and len(std_times) == (rows == 1)
+
+    if burst_mode == 'mean':
+        assert np.allclose(amps, [[1, 2]])
+        assert np.allclose(std, [np.std([0, 1, 2]), np.std([0, 2, 4])], atol=1e-2)
+
+
+def test_burst_validation():
+    with pytest.raises(ValueError):
+        jigs.ExpSettings(exp_duration_h=1, interval=1, exp_id='x', burst=0)
+
+    with pytest.raises(ValueError):
+        jigs.ExpSettings(exp_duration_h=1, interval=1, exp_id='x', burst_mode='median')
+
+    with pytest.raises(ValueError):
+        jigs.ExpSettings(exp_duration_h=1, interval=1, exp_id='x', backpressure='panic')
+
+
+def test_plan_is_rendered_once(jig_table):
+    plan = jigs.PulsePlan.compile({**SHARED, 'exp_id': 'plan'}, jig_table['zapdos'].mux_)
+
+    assert plan.pulser_commands == ('M1', 'W444', 'G300')
+    assert plan.mux_commands == ('X0,1',)
+    assert plan.scope_body == b'delay=10&duration=10&voltage_range=1&avg_num=8'
+    assert plan.scope.duration == 10.0
+
+
+def test_plan_converts_json_strings(jig_table):
+    plan = jigs.PulsePlan.compile({**SHARED, 'exp_id': 'plan', 'pulser': {'gain_dB': '30', 'mode': '1'}}, jig_table['pikachu'].mux_)
+
+    assert plan.pulser_commands == ('M1', 'W444', 'G300')
+
+
+def test_plan_is_immutable(jig_table):
+    names = ['peak']
+    plan = jigs.PulsePlan.compile({**SHARED, 'exp_id': 'plan', 'features': names}, jig_table['pikachu'].mux_)
+    names.append('tof')  # E.g. the payload kept around as jig.parameters
+
+    assert plan.settings.features == ('peak',)
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        plan.settings.interval = 2
+
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        plan.codec_spec.delta = True
+
+
+@pytest.mark.parametrize('invalid', [
+    {'picoscope': {'delay': 10, 'duration': 0, 'voltage_range': 1}},
+    {'picoscope': {'delay': 10}},
+    {'pulser': {'gain_dB': 30, 'transducer_frequency_MHz': 0}},
+    {'pulser': {'gain': 30}},
+    {'interval': 'soon'},
+    {'interval': 0},
+    {'pulser': {'gain_dB': 'loud'}},
+    {'pulser': {'gain_dB': 300}},
+    {'codec': {'dtype': 'float64'}},
+    {'backend': 'memmap', 'codec': {'dtype': 'float32', 'delta': True}},
+])
+def test_invalid_start_is_rejected_up_front(jig_table, invalid):
+    with pytest.raises(ValueError):
+        jigs.start_many(jig_table, {'pikachu': {'exp_id': 'a'}, 'zapdos': {'exp_id': 'b', **invalid}}, shared=SHARED)
+
+    assert all(jig.status == jigs.Status.not_started.value for jig in jig_table.values())
+
+
+def test_resume(jig_table):
+    jig_table['pikachu'].start({**SHARED, 'exp_id': 'resumed'}, wait=False)
+    jig_table['zapdos'].start({**SHARED, 'exp_id': 'stopped'}, wait=False)
+    jig_table['zapdos'].stop(wait=False)
+    jig_table['pikachu'].store([capture(0.0, [0.0, 1.0])])
+    jig_table['pikachu'].database.close()  # As if the process died, minus the lost batch
+    restarted = {
+        name: jigs.Jig(name=name, mux=jig.mux_, rig=jig.rig, registry=jigs.Registry(), catalog=jig.catalog, journal=jig.journal)
+        for name, jig in jig_table.items()
+    }
+
+    resumed = jigs.resume(restarted, journal=jig_table['pikachu'].journal)
+    restarted['pikachu'].store([capture(1.0, [1.0, 2.0])])
+    restarted['pikachu'].database.close()
+
+    assert resumed == ['pikachu']
+    assert restarted['pikachu'].status == jigs.Status.running.value
+    assert restarted['pikachu'].registry.active == {'pikachu': restarted['pikachu']}
+    assert restarted['zapdos'].status == jigs.Status.stopped.value
+    assert restarted['zapdos'].parameters['exp_id'] == 'stopped'
+    assert restarted['raichu'].status == jigs.Status.not_started.value
+    assert np.array_equal(next(database.read('resumed'))[0], [0.0, 1.0])
+    assert len(database.read_metadata('resumed')) == 1
+
+
+def test_stop_leaves_wrapping_up_to_a_busy_controller(jig_table):
+    jig = jig_table['pikachu']
+    jig.registry.has_controller = True  # Never acknowledges, e.g. mid-capture
+    jig.start({**SHARED, 'exp_id': 'busy'}, wait=False)
+    jig.stop()
+
+    assert not jig.database.closed
+
+    jig.finish(jig.run)  # What the controller does once it gets to it
+
+    assert jig.database.closed
+
+
+def test_store_uses_features_of_its_run(jig_table):
+    jig = jig_table['pikachu']
+    jig.registry.has_controller = True  # Wraps up nothing, so the first run can still store
+    jig.start({**SHARED, 'exp_id': 'bare', 'features': []}, wait=False)
+    first = jig.run
+    jig.start({**SHARED, 'exp_id': 'featured'}, wait=False)
+
+    jig.store([capture(1.0, [1.0, 2.0])], first)
+    pulse = events.bus.since(events.bus.last_id - 1)[-1]
+
+    assert (pulse.type, pulse.data['time']) == ('pulse', 1.0)
+    assert 'peak' not in pulse.data
+
+    jig.finish(first)
+    jig.registry.has_controller = False
+    jig.stop()
+
+
+def test_restart_wraps_up_previous_run(jig_table):
+    jig = jig_table['pikachu']
+    jig.start({**SHARED, 'exp_id': 'first'}, wait=False)
+    first = jig.run
+    jig.start({**SHARED, 'exp_id': 'second', 'interval': 2}, wait=False)
+
+    assert first.database.closed and not jig.database.closed
+    assert jig.settings.interval == 2
+    assert [record.exp_id for record in jig.catalog.live] == ['second']
+
+    with pytest.raises(ValueError):
+        jig.start({**SHARED, 'exp_id': 'second'}, wait=False)
+
+    jig.stop()
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from remotecontrol import config, journal
+from remotecontrol.journal import Journal
+
+
+@pytest.fixture
+def instance(tmp_path):
+    return Journal(path=str(tmp_path / 'journal.jsonl'))
+
+
+def test_replay_latest_per_jig(instance):
+    instance.append(jig='pikachu', event='start', payload={'exp_id': 'a'})
+    instance.append(jig='zapdos', event='start', payload={'exp_id': 'b'})
+    instance.append(jig='pikachu', event='stop', payload={'exp_id': 'a'})
+
+    latest = instance.replay()
+
+    assert {name: entry.event for name, entry in latest.items()} == {'pikachu': 'stop', 'zapdos': 'start'}
+    assert latest['zapdos'].payload == {'exp_id': 'b'}
+
+
+def test_replay_compacts(instance):
+    for i in range(10):
+        instance.append(jig='pikachu', event='start', payload={'exp_id': str(i)})
+
+    instance.replay()
+
+    with open(instance.path) as journal_file:
+        assert len(journal_file.readlines()) == 1
+
+    assert instance.replay()['pikachu'].payload == {'exp_id': '9'}
+
+
+def test_torn_line_is_skipped(instance):
+    instance.append(jig='pikachu', event='start', payload={'exp_id': 'a'})
+
+    with open(instance.path, 'a') as journal_file:
+        journal_file.write('{"jig": "zapdos", "ev')
+
+    assert list(instance.replay()) == ['pikachu']
+
+
+def test_append_after_torn_line_survives(instance):
+    with open(instance.path, 'w') as journal_file:
+        journal_file.write('{"jig": "zapdos", "ev')
+
+    instance.replay()
+    instance.append(jig='pikachu', event='start', payload={'exp_id': 'a'})
+
+    assert list(instance.replay()) == ['pikachu']
+
+
+def test_unknown_event(instance):
+    with pytest.raises(ValueError):
+        instance.append(jig='pikachu', event='pause', payload={})
+
+
+def test_default_adopts_legacy_journal(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    config.containers.cache_clear()
+    journal.default.cache_clear()
+    Journal(path=journal.LEGACY_PATH).append(jig='pikachu', event='start', payload={'exp_id': 'a'})
+
+    moved = journal.default()
+    journal.default.cache_clear()
+
+    assert moved.path == os.path.join(config.STATE_DIR, journal.FILENAME)
+    assert moved.replay()['pikachu'].payload == {'exp_id': 'a'}
+    assert not os.path.exists(journal.LEGACY_PATH)
@@ -0,0 +1,41 @@
+import pytest
+
+from remotecontrol.metrics import PREFIX, Metrics
+
+
+@pytest.fixture
+def instance():
+    return Metrics()
+
+
+def test_counter(instance):
+    instance.inc('pulses_total', jig='pikachu')
+    instance.inc('pulses_total', 2, jig='pikachu')
+
+    assert instance.counter('pulses_total', jig='pikachu') == 3
+    assert f'{PREFIX}pulses_total{{jig="pikachu"}} 3' in instance.render()
+
+
+def test_histogram_is_cumulative(instance):
+    instance.observe('stage_seconds', 0.002, stage='mux')
+    instance.observe('stage_seconds', 20, stage='mux')
+    rendered = instance.render()
+
+    assert f'{PREFIX}stage_seconds_bucket{{stage="mux",le="0.0025"}} 1' in rendered
+    assert f'{PREFIX}stage_seconds_bucket{{stage="mux",le="+Inf"}} 2' in rendered
+    assert f'{PREFIX}stage_seconds_count{{stage="mux"}} 2' in rendered
+
+
+def test_timer_observes_on_error(instance):
+    with pytest.raises(ZeroDivisionError):
+        with instance.timer('stage_seconds', stage='mux'):
+            1 / 0
+
+    assert f'{PREFIX}stage_seconds_count{{stage="mux"}} 1' in instance.render()
+
+
+def test_type_declared_once(instance):
+    instance.set('queue_depth', 1, jig='pikachu')
+    instance.set('queue_depth', 2, jig='zapdos')
+
+    assert instance.render().count(f'# TYPE {PREFIX}queue_depth gauge') == 1
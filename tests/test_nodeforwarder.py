@@ -0,0 +1,100 @@
+from time import monotonic
+
+import pytest
+
+from remotecontrol.nodeforwarder import NodeForwarder
+
+SETTLE_S = 0.05
+container = {'host': '127.0.0.1', 'port': 1}
+
+
+@pytest.fixture
+def instance():
+    return NodeForwarder(container=container, settle_s=SETTLE_S)
+
+
+def test_readiness_from_container():
+    instance = NodeForwarder(container={**container, 'settle_s': '0.1', 'ack': True}, settle_s=SETTLE_S)
+
+    assert instance.readiness.settle_s == 0.1
+    assert instance.readiness.ack is True
+
+
+def test_waits_for_settle(instance):
+    instance.last_write = monotonic()
+    instance.wait_until_ready()
+
+    assert monotonic() - instance.last_write >= SETTLE_S
+
+
+def test_idle_instrument_is_ready(instance):
+    instance.last_write = monotonic() - SETTLE_S
+    start = monotonic()
+    instance.wait_until_ready()
+
+    assert monotonic() - start < SETTLE_S / 2
+
+
+def test_waits_for_ack(instance, monkeypatch):
+    responses = iter(['', '', 'G300'])
+    monkeypatch.setattr(instance, 'lastread', lambda: next(responses))
+    instance.readiness.ack = True
+    instance.last_write, instance.last_command = monotonic(), 'G300'
+
+    instance.wait_until_ready()
+
+    assert next(responses, None) is None
+
+
+def test_write_many_is_one_request(instance, monkeypatch):
+    urls = list()
+    monkeypatch.setattr(instance.session, 'get', lambda url, timeout: urls.append(url) or type('', (), {'text': 'OK'}))
+
+    responses = instance.write_many(['M1', 'W444', 'G300'])
+
+    assert responses == ['OK'] * 3
+    assert urls == [f'{instance.url}/writecf/M1%0D%0AW444%0D%0AG300']
+    assert instance.last_command == 'G300'
+
+
+@pytest.fixture
+def urls(instance, monkeypatch):
+    urls = list()
+    monkeypatch.setattr(instance.session, 'get', lambda url, timeout: urls.append(url) or type('', (), {'text': 'OK'}))
+
+    return urls
+
+
+def test_apply_skips_unchanged(instance, urls):
+    assert instance.apply(['M1', 'W444', 'G300']) == ['M1', 'W444', 'G300']
+    last_write = instance.last_write
+
+    assert instance.apply(['M1', 'W444', 'G300']) == []
+    assert instance.apply(['M1', 'W444', 'G400']) == ['G400']
+    assert len(urls) == 2
+    assert instance.applied(['M1', 'G400'])
+    assert instance.last_write > last_write
+
+
+def test_unchanged_apply_does_not_settle(instance, urls):
+    instance.apply(['X0,1'])
+    instance.last_write -= SETTLE_S
+    instance.apply(['X0,1'])
+    start = monotonic()
+    instance.wait_until_ready()
+
+    assert monotonic() - start < SETTLE_S / 2
+
+
+def test_error_invalidates_shadow(instance, urls, monkeypatch):
+    instance.apply(['X0,1'])
+
+    def fail(url, timeout):
+        raise ConnectionError
+
+    monkeypatch.setattr(instance.session, 'get', fail)
+
+    with pytest.raises(ConnectionError):
+        instance.apply(['X0,2'])
+
+    assert not instance.applied(['X0,1'])
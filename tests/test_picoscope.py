@@ -0,0 +1,49 @@
+import io
+import json
+
+import numpy as np
+import pytest
+from requests import Response
+
+from remotecontrol import picoscope
+
+
+def response(content: bytes, content_type: str) -> Response:
+    response = Response()
+    response._content = content
+    response.headers['Content-Type'] = content_type
+
+    return response
+
+
+def npy(array: np.ndarray) -> bytes:
+    buffer = io.BytesIO()
+    np.save(buffer, array)
+
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize('order', ['C', 'F'])
+def test_decode_npy(order):
+    amps = np.asarray(np.arange(12, dtype=np.float32).reshape(3, 4), order=order)
+    content = npy(amps)
+
+    decoded = picoscope.decode(response(content, picoscope.NPY_MIME))[picoscope.KEY]
+
+    assert decoded.dtype == np.float32
+    assert np.array_equal(decoded, amps)
+    assert np.shares_memory(decoded, np.frombuffer(content, dtype=np.uint8))  # Zero-copy view
+
+
+def test_decode_json_fallback():
+    content = json.dumps({'amps': [0.0, 1.5]}).encode()
+
+    decoded = picoscope.decode(response(content, 'application/json'))
+
+    assert decoded == {'amps': [0.0, 1.5]}
+
+
+def test_decode_without_content_type_is_json():
+    decoded = picoscope.decode(response(json.dumps({'amps': [1.0]}).encode(), ''))
+
+    assert decoded == {'amps': [1.0]}
@@ -0,0 +1,96 @@
+import threading
+import time
+
+import pytest
+
+from remotecontrol.pipeline import Pipeline
+
+
+@pytest.fixture
+def instance():
+    instance = Pipeline()
+    yield instance
+
+    instance.stop()
+
+
+def test_runs_in_order(instance):
+    results = list()
+
+    for i in range(100):
+        instance.submit(results.append, i)
+
+    instance.join()
+
+    assert results == list(range(100))
+
+
+def test_survives_failing_job(instance):
+    results = list()
+    instance.submit(lambda: 1 / 0)
+    instance.submit(results.append, 1)
+    instance.join()
+
+    assert results == [1]
+    assert instance.depth == 0
+
+
+@pytest.fixture
+def stalled():
+    """Pipeline whose worker is stuck until `gate` is set, like a stalled disk."""
+
+    gate = threading.Event()
+    instance = Pipeline(capacity=4, reserve=1)
+    instance.submit(gate.wait)
+
+    while instance.depth > 0:  # Picked up by the worker
+        time.sleep(0.001)
+
+    yield instance, gate
+
+    gate.set()
+    instance.stop()
+
+
+def fill(instance, owner, policy, n, priority=0):
+    return [instance.submit(lambda: None, owner=owner, policy=policy, priority=priority) for _ in range(n)]
+
+
+def test_drop_oldest_stays_bounded(stalled):
+    instance, gate = stalled
+    fill(instance, 'pikachu', 'drop_oldest', 10)
+
+    assert instance.depth == instance.limit()
+    assert instance.dropped['pikachu'] == 10 - instance.limit()
+
+
+def test_decimate_keeps_every_other(stalled):
+    instance, gate = stalled
+    queued = fill(instance, 'pikachu', 'decimate', 4)
+
+    assert queued == [True, False, True, False]
+
+
+def test_priority_uses_reserve_and_evicts(stalled):
+    instance, gate = stalled
+    fill(instance, 'pikachu', 'drop_oldest', 10)
+
+    assert not instance.has_room()
+    assert instance.has_room(priority=1)
+    assert all(fill(instance, 'mew', 'block', 3, priority=1))
+    assert instance.dropped['mew'] == 0
+
+
+def test_block_waits_for_room(stalled):
+    instance, gate = stalled
+    fill(instance, 'pikachu', 'block', instance.limit())
+    blocked = threading.Thread(target=fill, args=(instance, 'pikachu', 'block', 1))
+    blocked.start()
+    blocked.join(timeout=0.1)
+
+    assert blocked.is_alive()
+
+    gate.set()
+    blocked.join(timeout=1)
+
+    assert not blocked.is_alive() and len(instance.dropped) == 0
@@ -0,0 +1,93 @@
+from collections import defaultdict
+import json
+import threading
+
+import pytest
+
+from remotecontrol import config, controller, jigs, mux, picoscope, pulser, rig
+
+CONTAINERS = {
+    'mux': {'host': '127.0.0.1', 'port': 9001},
+    'pulser': {'host': '127.0.0.1', 'port': 9002},
+    'picoscope': {'host': '127.0.0.1', 'port': 9003},
+    'rigs': {
+        'bench2': {
+            'mux': {'host': '127.0.0.1', 'port': 9011},
+            'pulser': {'host': '127.0.0.1', 'port': 9012},
+            'picoscope': {'host': '127.0.0.1', 'port': 9013},
+        },
+    },
+}
+JIGS = {
+    'pikachu': {'module': 0, 'switch': 0},
+    'zapdos': {'module': 0, 'switch': 1},
+    'raichu': {'module': 0, 'switch': 0, 'rig': 'bench2'},
+}
+CACHED = (config.containers, mux.default, pulser.default, picoscope.default, rig.rigs, jigs.jigs)
+
+
+@pytest.fixture
+def configured(tmp_path, monkeypatch):
+    """docker.json and jigs.json in the working directory, read afresh."""
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(jigs, 'registries', defaultdict(jigs.Registry))  # Controllers mark theirs
+    (tmp_path / config.PATH).write_text(json.dumps(CONTAINERS))
+    (tmp_path / jigs.JIGS_CONFIG).write_text(json.dumps(JIGS))
+
+    for function in CACHED:
+        function.cache_clear()
+
+    yield tmp_path
+
+    for function in CACHED:
+        function.cache_clear()
+
+
+def test_load_rigs(configured):
+    rigs = rig.load()
+
+    assert list(rigs) == [rig.DEFAULT, 'bench2']
+    assert rigs[rig.DEFAULT].mux is mux.default()
+    assert rigs['bench2'].mux.container == CONTAINERS['rigs']['bench2']['mux']
+    assert rigs['bench2'].scope.url.endswith(':9013/get_wave')
+
+
+def test_load_without_rigs(configured):
+    (configured / config.PATH).write_text(json.dumps({**CONTAINERS, 'rigs': {}}))
+    config.containers.cache_clear()
+
+    assert list(rig.load()) == [rig.DEFAULT]
+
+
+def test_jigs_are_assigned_to_their_rig(configured):
+    jig_table = jigs.load()
+
+    assert {name: jig.rig.name for name, jig in jig_table.items()} == {
+        'pikachu': rig.DEFAULT, 'zapdos': rig.DEFAULT, 'raichu': 'bench2'
+    }
+    assert jig_table['raichu'].registry is jigs.registries['bench2']
+    assert jig_table['raichu'].mux_ == mux.Channel(module=0, switch=0)
+
+
+def test_channel_limit_is_per_rig(configured, monkeypatch):
+    monkeypatch.setattr(mux, 'N_CHANNELS', 2)
+
+    assert len(jigs.load()) == 3  # Two on the default rig, one on bench2
+
+    (configured / jigs.JIGS_CONFIG).write_text(json.dumps({**JIGS, 'raichu': {'module': 0, 'switch': 2}}))
+
+    with pytest.raises(ValueError):
+        jigs.load()
+
+
+def test_start_all_runs_one_controller_per_rig(configured, monkeypatch):
+    monkeypatch.setattr(rig.Rig, 'warm_up', lambda self: None)
+
+    controllers = controller.start_all()
+
+    assert [controller_.rig.name for controller_ in controllers] == [rig.DEFAULT, 'bench2']
+    assert all(controller_.registry is jigs.registries[controller_.rig.name] for controller_ in controllers)
+    assert all(registry.has_controller for registry in jigs.registries.values())
+    assert controllers[0].pipeline is not controllers[1].pipeline
+    assert {'controller-default', 'controller-bench2'} <= {thread.name for thread in threading.enumerate()}
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from remotecontrol.ringbuffer import RingBuffer
+
+CAPACITY = 4
+N_SAMPLES = 8
+
+
+@pytest.fixture
+def instance():
+    return RingBuffer(capacity=CAPACITY)
+
+
+def test_empty(instance):
+    times, waveforms = instance.latest()
+
+    assert instance.last_time == -1.0
+    assert len(times) == 0 and len(waveforms) == 0
+
+
+def test_latest_wraps_around(instance):
+    for i in range(6):
+        instance.append(float(i), np.full(N_SAMPLES, i))
+
+    times, waveforms = instance.latest(n=10)
+
+    assert np.array_equal(times, [2, 3, 4, 5])
+    assert np.array_equal(waveforms[:, 0], [2, 3, 4, 5])
+    assert instance.last_time == 5.0
+
+
+def test_latest_is_a_copy(instance):
+    instance.append(0.0, np.zeros(N_SAMPLES))
+    _, waveforms = instance.latest()
+    waveforms[:] = 1
+
+    assert instance.latest()[1].sum() == 0
+
+
+def test_shape_change_resets(instance):
+    instance.append(0.0, np.zeros(N_SAMPLES))
+    instance.append(1.0, np.zeros(2 * N_SAMPLES))
+
+    assert len(instance) == 1
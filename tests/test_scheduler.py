@@ -0,0 +1,122 @@
+import pytest
+
+from remotecontrol.scheduler import Scheduler
+
+INTERVAL = 10.0
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def instance(clock):
+    return Scheduler(clock=clock)
+
+
+def test_fires_immediately(instance):
+    instance.add('pikachu', interval=INTERVAL)
+
+    assert instance.pop_due() == 'pikachu'
+
+
+def test_nothing_due(instance):
+    assert instance.pop_due() is None
+    assert instance.time_until_next() is None
+
+
+def test_interval_absorbs_acquisition_time(instance, clock):
+    instance.add('pikachu', interval=INTERVAL)
+    instance.pop_due()
+    clock.now = 3.0  # Acquisition took 3 s
+    instance.reschedule('pikachu')
+
+    assert instance.time_until_next() == pytest.approx(7.0)
+
+
+def test_orders_by_due_time(instance):
+    instance.add('zapdos', interval=INTERVAL, due=5.0)
+    instance.add('pikachu', interval=INTERVAL, due=1.0)
+
+    assert instance.time_until_next() == pytest.approx(1.0)
+
+
+def test_missed_deadlines(instance, clock):
+    instance.add('pikachu', interval=INTERVAL)
+    instance.pop_due()
+    clock.now = 25.0
+    instance.reschedule('pikachu')
+
+    assert instance.missed['pikachu'] == 2
+    assert instance.time_until_next() == pytest.approx(5.0)
+
+
+def test_remove(instance):
+    instance.add('pikachu', interval=INTERVAL)
+    instance.remove('pikachu')
+
+    assert 'pikachu' not in instance
+    assert instance.pop_due() is None
+
+
+def test_remove_in_flight(instance):
+    instance.add('pikachu', interval=INTERVAL)
+    instance.pop_due()
+    instance.remove('pikachu')
+    instance.reschedule('pikachu')
+
+    assert len(instance) == 0
+
+
+def test_invalid_interval(instance):
+    with pytest.raises(ValueError):
+        instance.add('pikachu', interval=0)
+
+
+def test_prefers_configured_jig(instance, clock):
+    instance.add('pikachu', interval=INTERVAL, due=0.0)
+    instance.add('zapdos', interval=INTERVAL, due=1.0)
+    instance.add('mew', interval=INTERVAL, due=5.0)
+    clock.now = 2.0
+
+    assert instance.pop_due(prefer=lambda name: name != 'pikachu') == 'zapdos'
+    assert instance.pop_due(prefer=lambda name: name == 'mew') == 'pikachu'  # mew isn't due
+    instance.reschedule('zapdos')
+
+    assert instance.time_until_next() == pytest.approx(3.0)  # The cancelled zapdos entry was dropped
+
+
+def test_retry_holds_back_without_missing(instance, clock):
+    instance.add('pikachu', interval=INTERVAL)
+    instance.pop_due()
+    instance.retry('pikachu', delay=0.5)
+
+    assert instance.pop_due() is None
+    assert instance.time_until_next() == pytest.approx(0.5)
+    assert instance.missed['pikachu'] == 0
+
+
+def test_preference_does_not_starve(instance, clock):
+    instance.add('pikachu', interval=0.1, due=0.0)
+    instance.add('raichu', interval=0.1, due=0.0)
+    instance.add('zapdos', interval=1.0, due=0.0)
+    pulsed = list()
+
+    for _ in range(100):  # Always some preferred jig due
+        clock.now += 0.1
+        name = instance.pop_due(prefer=lambda name: name != 'zapdos')
+
+        if name is not None:
+            pulsed.append(name)
+            instance.reschedule(name)
+
+    assert 'zapdos' in pulsed
@@ -3,6 +3,7 @@ import pytest
 import flask
 from flask.testing import FlaskClient
 
+from remotecontrol import database
 import server
 
 payload = {
@@ -64,6 +65,17 @@ def test_status_not_started(base_client):
     assert response.text == 0
 
 
+@pytest.mark.parametrize('route', ['/waveforms', '/features'])
+@pytest.mark.parametrize('every', [0, -1])
+def test_invalid_decimation(base_client, tmp_path, monkeypatch, route, every):
+    monkeypatch.chdir(tmp_path)
+    database.Database('test_every').close()
+
+    response = base_client.get(route, query_string={'exp_id': 'test_every', 'every': every})
+
+    assert response.status_code == 400
+
+
 # @pytest.fixture
 # def started_client(base_client: FlaskClient):
 #     yield base_client.post('/start', json=payload['jig'])
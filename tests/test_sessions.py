@@ -0,0 +1,27 @@
+from remotecontrol import sessions
+
+BASE_URL = 'http://0.0.0.0:1000'
+container = {'ip': 1, 'port': 1000, 'read_timeout': '60'}
+
+
+def test_settings_from_container():
+    settings = sessions.Settings.from_container(container, connect_timeout=2)
+
+    assert settings.timeout == (2.0, 60.0)
+    assert settings.retries == sessions.Settings.retries
+
+
+def test_session_is_shared():
+    settings = sessions.Settings()
+
+    assert sessions.get(BASE_URL, settings) is sessions.get(BASE_URL, settings)
+
+    sessions.close()
+
+
+def test_warm_up_unreachable():
+    settings = sessions.Settings(connect_timeout=0.1, read_timeout=0.1, retries=0)
+
+    assert sessions.warm_up('http://127.0.0.1:1', settings) is False
+
+    sessions.close()